@@ -1,10 +1,26 @@
 import sys
+import ast
+import csv
+import json
 import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import zipfile
+import copy
+import heapq
+from contextlib import contextmanager, nullcontext
+from array import array
+from collections import deque
+from itertools import accumulate, islice, pairwise
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                                QHBoxLayout, QLabel, QPushButton, QLineEdit,
                                QGroupBox, QSpinBox, QTextEdit, QSplitter,
                                QComboBox, QMessageBox, QTabWidget, QScrollArea, QSlider, QCheckBox,
-                               QDialog)
+                               QDialog, QFileDialog, QProgressBar)
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QFont, QColor
 
@@ -15,7 +31,10 @@ import matplotlib
 matplotlib.use('Qt5Agg')
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.colors import to_rgba
 from matplotlib.figure import Figure
+from matplotlib.patches import Circle
 
 import networkx as nx
 
@@ -28,8 +47,19 @@ class TreeNode:
 
     def __init__(self, key):
         self.key = key
+        # The stored value; differs from key only in trees with a key function
+        self.item = key
         self.left = None
         self.right = None
+        # For balancing: AVL keeps subtree heights, red-black keeps node colors
+        self.height = 1
+        self.red = False
+        # Copies of key this node stands for (above 1 only in multiset trees)
+        self.count = 1
+        # Number of keys (copies included) in the subtree rooted here, kept up to date by BinarySearchTree
+        self.size = 1
+        # Distance from the root, valid while the owning tree's depth cache is
+        self.cached_depth = 0
         # For visualization
         self.x = 0
         self.y = 0
@@ -38,315 +68,2412 @@ class TreeNode:
 
     def depth(self, root=None, d=0):
         """Return the depth of this node from the root. If root is None, assumes self is root (returns 0)."""
-        # Helper for BST: find node's depth from root
+        # Helper for BST: walk down from root towards this node's key
         if root is None:
             return 0
-        if root == self:
-            return d
-        if self.key < root.key and root.left:
-            return self.depth(root.left, d + 1)
-        if self.key > root.key and root.right:
-            return self.depth(root.right, d + 1)
+        node = root
+        while node is not None:
+            if node == self:
+                return d
+            node = node.left if self.key < node.key else node.right
+            d += 1
         return None  # Not found
 
     def count_subtree_nodes(self):
         """Return the size of the subtree rooted at this node."""
-        left = self.left.count_subtree_nodes() if self.left else 0
-        right = self.right.count_subtree_nodes() if self.right else 0
-        return 1 + left + right
+        return self.size
+
+
+# --- Compact Array-Backed Node Storage ---
+class ArrayNodeStore:
+    """Stores every node of a tree in parallel typed arrays instead of one object per node.
+
+    A node is just an index into the arrays; left/right hold child indices
+    (-1 for no child). Layout coordinates are only allocated once a layout is
+    assigned. Pass a typecode such as 'q' or 'd' to keep keys in a typed array
+    too; by default keys go into a plain list so any orderable key works.
+    Pass items=True to keep a column of stored values next to their keys
+    (for trees with a key function).
+
+    This trades speed for memory: a tree takes about a fifth of the memory
+    of TreeNode objects, but every field access goes through a handle
+    property, so inserts and rank queries run about 4x slower. Membership
+    tests, which walk the arrays directly, are as fast as with objects.
+    """
+
+    def __init__(self, key_typecode=None, items=False):
+        self.keys = array(key_typecode) if key_typecode else []
+        self.items = [] if items else None
+        self.left = array('i')
+        self.right = array('i')
+        self.height = array('i')
+        self.size = array('i')
+        self.count = array('i')
+        self.cached_depth = array('i')
+        self.red = bytearray()
+        self.x = None
+        self.y = None
+        self._free = []  # Indices of deleted nodes, reused by new_node()
+
+    def __len__(self):
+        return len(self.left) - len(self._free)
+
+    def new_node(self, key, item=None):
+        """Allocate a node for key (holding item, if the store keeps items) and return its handle."""
+        if self._free:
+            index = self._free.pop()
+            self.keys[index] = key
+            if self.items is not None:
+                self.items[index] = item
+            self.left[index] = -1
+            self.right[index] = -1
+            self.height[index] = 1
+            self.size[index] = 1
+            self.count[index] = 1
+            self.cached_depth[index] = 0
+            self.red[index] = 0
+        else:
+            if isinstance(self.left, memoryview):
+                self._unmap()
+            index = len(self.left)
+            self.keys.append(key)
+            if self.items is not None:
+                self.items.append(item)
+            self.left.append(-1)
+            self.right.append(-1)
+            self.height.append(1)
+            self.size.append(1)
+            self.count.append(1)
+            self.cached_depth.append(0)
+            self.red.append(0)
+            if self.x is not None:
+                self.x.append(0.0)
+                self.y.append(0.0)
+        return ArrayNode(self, index)
+
+    def _unmap(self):
+        """Copy columns that are views into a loaded tree file into growable arrays."""
+        for name in ("keys", "left", "right", "height", "size", "count", "cached_depth"):
+            column = getattr(self, name)
+            if isinstance(column, memoryview):
+                grown = array(column.format)
+                grown.frombytes(column.cast('B'))
+                setattr(self, name, grown)
+        if isinstance(self.red, memoryview):
+            self.red = bytearray(self.red)
+
+    def release(self, node):
+        """Return a deleted node's slot for reuse."""
+        self._free.append(node._index)
+
+    def ensure_layout(self):
+        """Allocate the x/y coordinate arrays the first time they are needed."""
+        if self.x is None:
+            self.x = array('d', bytes(8 * len(self.left)))
+            self.y = array('d', bytes(8 * len(self.left)))
+
+    def find(self, root, key):
+        """Return True if key is stored below root, walking the index arrays directly."""
+        keys, left, right = self.keys, self.left, self.right
+        index = root._index if root is not None else -1
+        while index >= 0:
+            node_key = keys[index]
+            if key == node_key:
+                return True
+            index = left[index] if key < node_key else right[index]
+        return False
+
+
+class ArrayNode:
+    """Lightweight handle to one node of an ArrayNodeStore, with the same attributes as TreeNode."""
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __eq__(self, other):
+        return (isinstance(other, ArrayNode) and other._index == self._index
+                and other._store is self._store)
+
+    def __hash__(self):
+        return hash((id(self._store), self._index))
+
+    def _child(self, index):
+        return ArrayNode(self._store, index) if index >= 0 else None
+
+    @property
+    def key(self):
+        return self._store.keys[self._index]
+
+    @key.setter
+    def key(self, value):
+        self._store.keys[self._index] = value
+
+    @property
+    def item(self):
+        store = self._store
+        return store.items[self._index] if store.items is not None else store.keys[self._index]
+
+    @item.setter
+    def item(self, value):
+        self._store.items[self._index] = value
+
+    @property
+    def left(self):
+        return self._child(self._store.left[self._index])
+
+    @left.setter
+    def left(self, node):
+        self._store.left[self._index] = node._index if node is not None else -1
+
+    @property
+    def right(self):
+        return self._child(self._store.right[self._index])
+
+    @right.setter
+    def right(self, node):
+        self._store.right[self._index] = node._index if node is not None else -1
+
+    @property
+    def height(self):
+        return self._store.height[self._index]
+
+    @height.setter
+    def height(self, value):
+        self._store.height[self._index] = value
+
+    @property
+    def size(self):
+        return self._store.size[self._index]
+
+    @size.setter
+    def size(self, value):
+        self._store.size[self._index] = value
+
+    @property
+    def count(self):
+        return self._store.count[self._index]
+
+    @count.setter
+    def count(self, value):
+        self._store.count[self._index] = value
+
+    @property
+    def cached_depth(self):
+        return self._store.cached_depth[self._index]
+
+    @cached_depth.setter
+    def cached_depth(self, value):
+        self._store.cached_depth[self._index] = value
+
+    @property
+    def red(self):
+        return bool(self._store.red[self._index])
+
+    @red.setter
+    def red(self, value):
+        self._store.red[self._index] = value
+
+    @property
+    def x(self):
+        return self._store.x[self._index] if self._store.x is not None else 0
+
+    @x.setter
+    def x(self, value):
+        self._store.ensure_layout()
+        self._store.x[self._index] = value
+
+    @property
+    def y(self):
+        return self._store.y[self._index] if self._store.y is not None else 0
+
+    @y.setter
+    def y(self, value):
+        self._store.ensure_layout()
+        self._store.y[self._index] = value
+
+    depth = TreeNode.depth
+    count_subtree_nodes = TreeNode.count_subtree_nodes
+
+
+# Storage backends a BinarySearchTree can keep its nodes in
+STORAGE_BACKENDS = ("objects", "arrays")
+
+# Placeholder of the key boxes: what _parse_key_text() turns typed text into
+KEY_INPUT_HINT = "Number, (tuple) or text"
+
+# Key functions that select the typed fast path, with the array typecode for their keys
+SCALAR_KEYS = {int: 'q', float: 'd'}
+
+
+def _float_key(value):
+    """Convert a key=float key like float() does, refusing NaN (it compares false with every key)."""
+    key = float(value)
+    if key != key:
+        raise ValueError("NaN cannot be a key: it is neither smaller nor larger than any other key")
+    return key
+
+
+# What the typed key functions actually run on keys and probes
+SCALAR_CONVERSIONS = {int: int, float: _float_key}
+
+
+def _parse_key_text(text):
+    """Turn text typed into a key box into a key: an int of any size, a float, a tuple literal, or else the text.
+
+    Raises ValueError for NaN.
+    """
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        value = float(text)
+    except ValueError:
+        pass
+    else:
+        return _float_key(value)
+    if text.startswith("("):
+        try:
+            value = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            value = None
+        if isinstance(value, tuple):
+            return value
+    return text  # Anything else is a string key, sorted alphabetically
+
+# Files written by BinarySearchTree.save(): this header (magic, balance policy,
+# key function, flags, key typecode, slot count, root index, free slot count),
+# then the node columns back to back, each padded to a multiple of 8 bytes
+TREE_FILE_MAGIC = b"PYTREE\x00\x01"
+TREE_FILE_HEADER = struct.Struct("<8sBBHc3xqqq")
+TREE_FILE_KEY_FUNCS = (None, int, float)
+TREE_FILE_MULTISET, TREE_FILE_DEPTHS_VALID, TREE_FILE_COLORS = 1, 2, 4
+
+# Formats BinarySearchTree.export_nodes() writes, with their file dialog filters
+EXPORT_FORMATS = {
+    "csv": "CSV (*.csv)",
+    "jsonl": "JSON Lines (*.jsonl)",
+    "columnar": "NumPy columns (*.npz)",
+}
+
+# One exported row per node, in this column order
+EXPORT_COLUMNS = ("value", "depth", "path", "is_leaf", "has_left_child", "has_right_child", "subtree_size")
+EXPORT_CSV_HEADER = ("Value", "Depth", "Path", "IsLeaf", "HasLeft", "HasRight", "SubtreeSize")
+
+
+def _write_npz_columns(file, spool_dir, dtypes, rows):
+    """Assemble a columnar export's spooled batches into an .npz archive, one .npy member per column.
+
+    dtypes maps each column to the dtypes of its batches, which are saved
+    as spool_dir/<column>.<batch>.npy. A member is written as a header for
+    the whole column followed by the batches' bytes, one batch in memory at
+    a time. Only a column of Python objects (keys NumPy has no dtype for)
+    is gathered whole, since .npy pickles such arrays in one piece.
+    """
+    with zipfile.ZipFile(file, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name in EXPORT_COLUMNS:
+            parts = [os.path.join(spool_dir, f"{name}.{i}.npy") for i in range(len(dtypes[name]))]
+            try:
+                dtype = np.result_type(*dtypes[name]) if parts else np.dtype(float)
+            except TypeError:
+                dtype = np.dtype(object)
+            with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                if dtype.hasobject:
+                    column = np.concatenate([np.load(part, allow_pickle=True) for part in parts]).astype(object)
+                    np.lib.format.write_array(member, column, allow_pickle=True)
+                    continue
+                np.lib.format.write_array_header_1_0(member, {
+                    'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (rows,)})
+                for part in parts:
+                    member.write(np.load(part).astype(dtype, copy=False).tobytes())
+
+# Key files read_key_chunks() reads, with their file dialog filters
+IMPORT_FORMATS = {
+    "text": "Text files (*.txt)",
+    "csv": "CSV (*.csv)",
+    "binary": "Raw int64 keys (*.bin)",
+}
+
+# Text key files are read in blocks of this many bytes, so one long line is not read whole
+IMPORT_BLOCK_SIZE = 1 << 16
+
+# Read-optimized layouts a FrozenTree can answer single-key lookups from
+STATIC_LAYOUTS = ("eytzinger", "veb")
+
+# Traversal orders, with the labels used in messages and the UI
+TRAVERSAL_ORDERS = {
+    "inorder": "In-Order",
+    "preorder": "Pre-Order",
+    "postorder": "Post-Order",
+    "levelorder": "Level-Order",
+}
+
+
+# Balancing policies a BinarySearchTree can be constructed with
+BALANCE_POLICIES = ("none", "avl", "red_black")
+
+# How much of each operation a BinarySearchTree records as visualization steps:
+# nothing, the start/finish and structural changes, or every node visited
+TRACE_LEVELS = ("off", "summary", "full")
+
+# The direction each traversal order takes, as shown in its step messages
+TRAVERSAL_DIRECTIONS = {
+    "inorder": "Left -> Root -> Right",
+    "preorder": "Root -> Left -> Right",
+    "postorder": "Left -> Right -> Root",
+    "levelorder": "top to bottom, left to right",
+}
+
+
+def _traversal_label(step):
+    return TRAVERSAL_ORDERS[step['order']].lower()
+
+
+# Message of each step action, worked out from the step only when it is shown
+STEP_MESSAGES = {
+    'start_insert': lambda s: f"Starting insertion of value {s['value']}",
+    'insert_root': lambda s: f"Tree was empty. {s['value']} inserted as root node.",
+    'finish_insert': lambda s: f"Insertion of {s['value']} completed!",
+    'visit': lambda s: f"Visiting node with value {s['node'].key}",
+    'compare': lambda s: (f"{s['value']} < {s['node'].key}, moving to left child" if s['result'] == 'less'
+                          else f"{s['value']} > {s['node'].key}, moving to right child"),
+    'insert': lambda s: (f"{s['direction'].capitalize()} child is empty. "
+                         f"Inserting {s['value']} as {s['direction']} child of {s['parent'].key}"),
+    'increment': lambda s: f"Value {s['value']} already exists. Its count goes up to {s['count']}.",
+    'duplicate': lambda s: f"Value {s['value']} already exists in the tree. Duplicates are not inserted.",
+    'start_search': lambda s: f"Starting search for value {s['value']}",
+    'found': lambda s: f"Found! {s['value']} matches current node value.",
+    'visit_null': lambda s: f"Reached a null node. Value {s['value']} not found in this path.",
+    'finish_search': lambda s: (f"Value {s['value']} was found in the tree!" if s['found']
+                                else f"Value {s['value']} was NOT found in the tree!"),
+    'start_range': lambda s: (f"Starting range query for keys from {s['value']}"
+                              + (f" to {s['high']}" if s['high'] is not None else "")),
+    'visit_range': lambda s: f"{s['node'].key} is in range",
+    'finish_range': lambda s: f"Range query completed: {s['count']} keys found",
+    'start_query': lambda s: f"Looking for the {s['query']} of {s['value']}",
+    'query_result': lambda s: (f"The {s['query']} of {s['value']} is {s['node'].key}" if s.get('node') is not None
+                               else f"{s['value']} has no {s['query']} in the tree"),
+    'start_traversal': lambda s: f"Starting {_traversal_label(s)} traversal ({TRAVERSAL_DIRECTIONS[s['order']]})",
+    'finish_traversal': lambda s: f"{_traversal_label(s).capitalize()} traversal completed: {s['result']}",
+    'traverse_left': lambda s: f"At node {s['node'].key}, traversing left subtree first",
+    'traverse_right': lambda s: f"At node {s['node'].key}, traversing right subtree now",
+    'start_delete': lambda s: f"Starting deletion of value {s['value']}",
+    'decrement': lambda s: f"{s['value']} has more than one copy. Its count goes down to {s['count']}.",
+    'visit_successor': lambda s: (f"Looking for the successor of {s['value']}: "
+                                  f"{s['node'].key} has a left child, moving left"),
+    'successor_found': lambda s: (f"{s['node'].key} is the smallest key larger than {s['value']}, "
+                                  f"so it will take {s['value']}'s place"),
+    'splice': lambda s: f"Spliced successor {s['node'].key} into the place of {s['value']}",
+    'remove': lambda s: f"Removed {s['value']}" + (f"; its child {s['node'].key} moves up" if s.get('node') is not None
+                                                 else ", a leaf"),
+    'finish_delete': lambda s: (f"Value {s['value']} was NOT found in the tree. Nothing to delete."
+                                if not s['deleted'] else f"Removed one copy of {s['value']}." if s.get('one_copy')
+                                else f"Deletion of {s['value']} completed!"),
+    'rotate_left': lambda s: f"Rotating left at {s['node'].key}: {s['pivot'].key} moves up",
+    'rotate_right': lambda s: f"Rotating right at {s['node'].key}: {s['pivot'].key} moves up",
+    'recolor': lambda s: f"Recoloring {s['node'].key} {'red' if s['red'] else 'black'}",
+}
+STEP_MESSAGES.update({
+    f'visit_{order}': lambda s: f"Visiting node {s['node'].key} in {TRAVERSAL_ORDERS[s['action'][6:]].lower()} traversal"
+    for order in TRAVERSAL_ORDERS
+})
+
+# Step actions in the order of their codes in a StepTrace
+STEP_ACTIONS = tuple(STEP_MESSAGES)
+STEP_CODES = {action: code for code, action in enumerate(STEP_ACTIONS)}
+
+
+def path_string(bits, depth):
+    """Spell out a path recorded as bits (1 = right, first move highest) and depth, e.g. "root.left.right"."""
+    if depth == 0:
+        return "root"
+    return "root" + "".join(".right" if bit == "1" else ".left" for bit in format(bits, f"0{depth}b"))
+
+
+def make_step(action, node=None, value=None, path=None, **extra):
+    """Build the step dict for one action, message included; path is a (bits, depth) pair."""
+    step = {'action': action}
+    if node is not None:
+        step['node'] = node
+    if value is not None:
+        step['value'] = value
+    if path is not None:
+        step['path'] = path_string(*path)
+    step.update(extra)
+    step['message'] = STEP_MESSAGES[action](step)
+    return step
+
+
+class StepTrace:
+    """The visualization steps of one operation, kept in columns rather than one dict per step.
+
+    A step is an action code, a node, a value and the node's path as a bit
+    string plus depth; the few fields only some actions have go into a
+    small dict for that step. Indexing or iterating gives the usual step
+    dict, and only then are its path and message strings made, so steps
+    nobody shows never pay for their text.
+    """
+
+    __slots__ = ('actions', 'nodes', 'values', 'path_bits', 'depths', 'extras', 'roots')
+
+    def __init__(self):
+        self.actions = array('B')
+        self.nodes = []
+        self.values = []
+        self.path_bits = []
+        self.depths = array('i')  # -1 for steps without a path
+        self.extras = {}  # step index -> fields beyond action/node/value/path
+        self.roots = []  # Version root of the first len(roots) steps (persistent trees)
+
+    def record(self, action, node=None, value=None, path=None, **extra):
+        """Append a step; path is a (bits, depth) pair."""
+        self.actions.append(STEP_CODES[action])
+        self.nodes.append(node)
+        self.values.append(value)
+        if path is None:
+            self.path_bits.append(0)
+            self.depths.append(-1)
+        else:
+            self.path_bits.append(path[0])
+            self.depths.append(path[1])
+        if extra:
+            self.extras[len(self.actions) - 1] = extra
+
+    def stamp(self, root, copies=None):
+        """Give every step not stamped yet the version root it belongs to, pointing its nodes at copies."""
+        for i in range(len(self.roots), len(self.actions)):
+            if copies:
+                if self.nodes[i] in copies:
+                    self.nodes[i] = copies[self.nodes[i]]
+                extra = self.extras.get(i)
+                if extra is not None:
+                    for field in ('parent', 'pivot'):
+                        if extra.get(field) in copies:
+                            extra[field] = copies[extra[field]]
+            self.roots.append(root)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.actions)
+        if not 0 <= index < len(self.actions):
+            raise IndexError("step index out of range")
+        extra = dict(self.extras.get(index, ()))
+        if index < len(self.roots):
+            extra['root'] = self.roots[index]
+        path = (self.path_bits[index], self.depths[index]) if self.depths[index] >= 0 else None
+        return make_step(STEP_ACTIONS[self.actions[index]], self.nodes[index], self.values[index], path, **extra)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self.actions)))
+
+
+class StepStream:
+    """An operation's steps as playback goes through them, pulled from an iterable on demand.
+
+    At most lookahead steps are fetched ahead of the one shown, so playback
+    of a step generator (see traversal_steps()) starts at its first step
+    and never holds the whole operation. The last history shown steps stay
+    available for stepping back.
+    """
+
+    def __init__(self, steps=(), lookahead=32, history=1000):
+        self._source = iter(steps)
+        self._ahead = deque()
+        self._shown = deque(maxlen=history)
+        self._back = 0  # How many shown steps we have stepped back over
+        self.lookahead = lookahead
+
+    def _fill(self):
+        """Top the look-ahead buffer up from the source."""
+        while len(self._ahead) < self.lookahead:
+            step = next(self._source, None)
+            if step is None:
+                break
+            self._ahead.append(step)
+
+    def has_next(self):
+        if self._back:
+            return True
+        if not self._ahead:
+            self._fill()
+        return bool(self._ahead)
+
+    def has_previous(self):
+        return self._back + 1 < len(self._shown)
+
+    def next(self):
+        """Move to the next step and return it, or None after the last one."""
+        if self._back:
+            self._back -= 1
+            return self._shown[-1 - self._back]
+        if not self.has_next():
+            return None
+        step = self._ahead.popleft()
+        self._shown.append(step)
+        self._fill()
+        return step
+
+    def previous(self):
+        """Move back to the step before the current one and return it, or None at the first kept step."""
+        if not self.has_previous():
+            return None
+        self._back += 1
+        return self._shown[-1 - self._back]
 
 
 class BinarySearchTree:
     """Main class that manages the entire binary search tree"""
 
-    def __init__(self, root=None):
+    def __init__(self, root=None, balance="none", storage="objects", persistent=False, multiset=False, key=None,
+                 trace="full"):
+        if balance not in BALANCE_POLICIES:
+            raise ValueError(f"Unknown balance policy {balance!r}; expected one of {BALANCE_POLICIES}")
+        if persistent and storage != "objects":
+            raise ValueError("Persistent trees need storage='objects'")
+        self.balance = balance
+        # A multiset keeps one node per distinct key and counts repeated inserts on it
+        self.multiset = multiset
+        # With a key function, inserted items are ordered by key(item), worked
+        # out once per node and kept in node.key (node.item keeps the item);
+        # lookups and deletes take keys, like bisect's key=. key=int and
+        # key=float are the typed fast path instead: every key, probes
+        # included, is converted to an exact int or float on the way in (NaN
+        # is refused), so comparisons stay on CPython's int/float compare
+        # rather than e.g. NumPy scalars' (about 1.2x faster object-tree lookups), and
+        # array storage keeps the keys in a typed column.
+        self.key_func = key
+        self._scalar = key if key in SCALAR_KEYS else None
+        self._key_of = SCALAR_CONVERSIONS.get(self._scalar, key)
+        # Nodes are either TreeNode objects or handles into an ArrayNodeStore
+        if isinstance(storage, ArrayNodeStore):
+            self.store = storage
+        elif storage == "arrays":
+            if self._scalar is not None:
+                self.store = ArrayNodeStore(SCALAR_KEYS[self._scalar])
+            else:
+                self.store = ArrayNodeStore(items=key is not None)
+        elif storage == "objects":
+            self.store = None
+        else:
+            raise ValueError(f"Unknown storage {storage!r}; expected one of {STORAGE_BACKENDS} or an ArrayNodeStore")
         if root is not None:
-            self.root = TreeNode(root)
+            key = self._key_of(root) if self.key_func is not None else root
+            self.root = self._new_node(key, key if self._scalar is not None else root)
         else:
             self.root = None
+        # Every node's cached_depth is correct while this is True. Rotations and
+        # deletes that lift a subtree clear it; depth_of() refreshes lazily.
+        self._depths_valid = True
+        # Persistent trees keep their depths here instead: their nodes are shared
+        # with other versions (and views, split-off trees) where they may sit
+        # at other depths, so no tree writes depths into them
+        self._version_depths = {} if persistent else None
+        # "pointer" walks the nodes for `key in tree`; a static layout answers
+        # lookups from a FrozenTree snapshot that is rebuilt after writes
+        self.lookup_layout = "pointer"
+        self._snapshot = None
+        # A persistent tree never changes a node an earlier version can reach:
+        # each mutation copies the nodes it touches (a root-to-leaf path plus a
+        # few siblings) and shares everything else. versions holds one root per
+        # mutation, and every recorded step carries the root it was taken on.
+        self.persistent = persistent
+        self.versions = [self.root] if persistent else []
+        self._copies = {}  # original -> copy (and copy -> copy) for the running mutation
         # For visualization and learning
-        self.steps = []
+        self.trace = trace
+        self.steps = StepTrace()
         self.current_step = 0
 
+    @classmethod
+    def from_sorted(cls, iterable, balance="none", storage="objects", persistent=False, multiset=False, key=None,
+                    trace="full"):
+        """Build a height-optimal tree from keys (or items, given a key function) in ascending order in O(n).
+
+        Repeated keys are skipped, or counted when multiset is True. No
+        visualization steps are recorded.
+        """
+        tree = cls(balance=balance, storage=storage, persistent=persistent, multiset=multiset, key=key, trace=trace)
+        key_func = tree._key_of
+        keys = []
+        items = [] if key_func is not None and tree._scalar is None else None
+        counts = [] if multiset else None
+        for item in iterable:
+            key = key_func(item) if key_func is not None else item
+            if keys and not key > keys[-1]:
+                if key == keys[-1]:
+                    if multiset:
+                        counts[-1] += 1
+                    continue
+                raise ValueError(f"from_sorted() needs ascending keys, got {key!r} after {keys[-1]!r}")
+            keys.append(key)
+            if items is not None:
+                items.append(item)
+            if multiset:
+                counts.append(1)
+        tree.root = tree._build_balanced(keys, counts, items)
+        if persistent:
+            tree.versions = [tree.root]
+        return tree
+
+    @classmethod
+    def from_iterable(cls, iterable, balance="none", storage="objects", persistent=False, multiset=False, key=None,
+                      trace="full"):
+        """Build a height-optimal tree from keys (or items) in any order (sorts them first)."""
+        return cls.from_sorted(sorted(iterable, key=key), balance=balance, storage=storage, persistent=persistent,
+                               multiset=multiset, key=key, trace=trace)
+
+    @property
+    def trace(self):
+        """How much operations record in steps: "off", "summary" or "full" (see TRACE_LEVELS).
+
+        "full" records every node visited, for step-by-step animation.
+        "summary" keeps the start and finish of each operation plus the
+        structural changes (new node, splice, rotation, recoloring). "off"
+        records nothing, and the walks skip the path strings and messages
+        too, so operations run at plain engine speed and return no steps.
+        """
+        return self._trace
+
+    @trace.setter
+    def trace(self, level):
+        if level not in TRACE_LEVELS:
+            raise ValueError(f"Unknown trace level {level!r}; expected one of {TRACE_LEVELS}")
+        self._trace = level
+        self._trace_summary = level != "off"
+        self._trace_full = level == "full"
+
+    @contextmanager
+    def tracing(self, level):
+        """Use another trace level for the operations inside a with block."""
+        previous = self.trace
+        self.trace = level
+        try:
+            yield self
+        finally:
+            self.trace = previous
+
+    def _new_node(self, key, item):
+        """Create a node for key, holding item, in this tree's storage backend."""
+        if self.store is not None:
+            return self.store.new_node(key, item)
+        node = TreeNode(key)
+        node.item = item
+        return node
+
+    def _probe(self, key):
+        """Convert a lookup key to the tree's scalar key type (key=int or key=float trees only)."""
+        return self._key_of(key) if self._scalar is not None else key
+
+    def __len__(self):
+        """Number of keys in the tree (every copy counts in a multiset)."""
+        return self.root.size if self.root is not None else 0
+
+    def node_count(self):
+        """Number of nodes in the tree: len() for a set, one per distinct key in a multiset (O(n) walk)."""
+        if not self.multiset:
+            return len(self)
+        return sum(1 for _ in self._inorder_nodes())
+
+    def __contains__(self, key):
+        """Plain membership test without recording any visualization steps."""
+        key = self._probe(key)
+        if self.lookup_layout != "pointer":
+            if self._snapshot is None:
+                self._snapshot = self.freeze(self.lookup_layout)
+            return key in self._snapshot
+        if self.store is not None:
+            return self.store.find(self.root, key)
+        node = self.root
+        while node is not None:
+            if key == node.key:
+                return True
+            node = node.left if key < node.key else node.right
+        return False
+
+    def _build_balanced(self, keys, counts=None, items=None):
+        """Link sorted, distinct keys into a tree by repeatedly taking the middle key as the subtree root.
+
+        counts, if given, holds each key's multiplicity for a multiset tree,
+        and items the value stored with each key.
+        """
+        if items is None:
+            items = keys
+        if not keys:
+            return None
+        # prefix[hi] - prefix[lo] is the size of the subtree built from keys[lo:hi]
+        prefix = range(len(keys) + 1) if counts is None else list(accumulate(counts, initial=0))
+        # A middle-split subtree of m keys is exactly m.bit_length() levels tall,
+        # so heights are known up front. For red-black trees only the bottom
+        # level (when the tree has more than one) is colored red.
+        red_depth = len(keys).bit_length() - 1 if self.balance == "red_black" else -1
+        mid = len(keys) // 2
+        root = self._new_node(keys[mid], items[mid])
+        root.height = len(keys).bit_length()
+        root.size = prefix[-1]
+        stack = [(root, 0, mid, len(keys), 0)]
+        while stack:
+            node, lo, mid, hi, depth = stack.pop()
+            if counts is not None:
+                node.count = counts[mid]
+            if lo < mid:
+                child_mid = (lo + mid) // 2
+                node.left = self._new_node(keys[child_mid], items[child_mid])
+                node.left.height = (mid - lo).bit_length()
+                node.left.size = prefix[mid] - prefix[lo]
+                node.left.cached_depth = depth + 1
+                node.left.red = depth + 1 == red_depth
+                stack.append((node.left, lo, child_mid, mid, depth + 1))
+            if mid + 1 < hi:
+                child_mid = (mid + 1 + hi) // 2
+                node.right = self._new_node(keys[child_mid], items[child_mid])
+                node.right.height = (hi - mid - 1).bit_length()
+                node.right.size = prefix[hi] - prefix[mid + 1]
+                node.right.cached_depth = depth + 1
+                node.right.red = depth + 1 == red_depth
+                stack.append((node.right, mid + 1, child_mid, hi, depth + 1))
+        return root
+
     def insert(self, key):
-        """Insert a new key into the binary search tree."""
-        self.steps = []  # Reset steps for visualization
+        """Insert a new key (an item, in a tree with a key function) into the binary search tree."""
+        self.steps = StepTrace()  # Reset steps for visualization
+        self._copies = {}
+        item = key
+        if self.key_func is not None:
+            key = self._key_of(item)
+            if self._scalar is not None:
+                item = key
 
         # Log this step
-        self.steps.append({
-            'action': 'start_insert',
-            'value': key,
-            'message': f"Starting insertion of value {key}"
-        })
+        if self._trace_summary:
+            self.steps.record('start_insert', value=key)
 
         if self.root is None:
-            self.root = TreeNode(key)
+            self.root = self._new_node(key, item)
+            self._snapshot = None
+            self._copies[self.root] = self.root
             # Log this step
-            self.steps.append({
-                'action': 'insert_root',
-                'node': self.root,
-                'message': f"Tree was empty. {key} inserted as root node."
-            })
+            if self._trace_summary:
+                self.steps.record('insert_root', self.root, key)
         else:
-            self._insert_rec(self.root, key)
+            inserted = self._insert_iter(key, item) if self._trace_summary else self._descend(key, item)
+            if inserted is not None:
+                self._attach(*inserted)
 
         # Final step
-        self.steps.append({
-            'action': 'finish_insert',
-            'value': key,
-            'message': f"Insertion of {key} completed!"
-        })
+        if self._trace_summary:
+            self.steps.record('finish_insert', value=key)
 
+        if self.persistent:
+            self._finish_version()
         return self.steps
 
-    def _insert_rec(self, node, key, path="root"):
-        """Helper method to insert a new key recursively."""
-        # Log visiting this node
-        self.steps.append({
-            'action': 'visit',
-            'node': node,
-            'path': path,
-            'message': f"Visiting node with value {node.key}"
-        })
-
-        # Log comparison
-        if key < node.key:
-            self.steps.append({
-                'action': 'compare',
-                'node': node,
-                'value': key,
-                'result': 'less',
-                'path': path,
-                'message': f"{key} < {node.key}, moving to left child"
-            })
-
-            if node.left is None:
-                node.left = TreeNode(key)
-                # Log insertion
-                self.steps.append({
-                    'action': 'insert',
-                    'node': node.left,
-                    'parent': node,
-                    'direction': 'left',
-                    'path': f"{path}.left",
-                    'message': f"Left child is empty. Inserting {key} as left child of {node.key}"
-                })
+    def _attach(self, path, node):
+        """Link a node found by _insert_iter below the end of path and rebalance.
+
+        node is None for a multiset duplicate: the last node on path holds
+        the key and gets one more copy.
+        """
+        if node is None:
+            path = self._copy_path(path) if self.persistent else path
+            path[-1][0].count += 1
+            self._update_path(path)
+            return
+        self._snapshot = None
+        if self.persistent:
+            self._copies[node] = node
+            path = self._copy_path(path)
+        self._link(path[-1], node)
+        if self._version_depths is None:
+            node.cached_depth = len(path)
+        elif self._depths_valid:
+            self._version_depths[node] = len(path)
+        if self.balance == "avl":
+            self._avl_fix_path(path)
+        else:
+            self._update_path(path)
+            if self.balance == "red_black":
+                self._rb_fix_insert(path, node)
+                # Rotations keep the rotated nodes up to date, but heights above them may shrink
+                self._update_path(path)
+
+    def insert_many(self, keys):
+        """Insert keys (or items) one after another without recording visualization steps.
+
+        Returns how many were added; duplicates a set skips are not counted.
+        A persistent tree gets a single new version for the whole batch, and
+        nodes copied earlier in the batch are changed in place.
+        """
+        self.steps = StepTrace()
+        self._copies = {}
+        added = 0
+        with self.tracing("off"):  # Rebalancing records nothing either
+            for item in keys:
+                key = item
+                if self.key_func is not None:
+                    key = self._key_of(item)
+                    if self._scalar is not None:
+                        item = key
+                if self.root is None:
+                    self.root = self._new_node(key, item)
+                    self._copies[self.root] = self.root
+                    self._snapshot = None
+                    added += 1
+                    continue
+                inserted = self._descend(key, item)
+                if inserted is not None:
+                    self._attach(*inserted)
+                    added += 1
+        if self.persistent:
+            self._finish_version()
+        return added
+
+    def _descend(self, key, item):
+        """Walk down to where key belongs like _insert_iter, without logging; same return values."""
+        node = self.root
+        ancestors = []
+        while True:
+            if key < node.key:
+                ancestors.append((node, True))
+                if node.left is None:
+                    break
+                node = node.left
+            elif key > node.key:
+                ancestors.append((node, False))
+                if node.right is None:
+                    break
+                node = node.right
+            elif self.multiset:
+                ancestors.append((node, False))
+                return ancestors, None
             else:
-                self._insert_rec(node.left, key, f"{path}.left")
-
-        elif key > node.key:
-            self.steps.append({
-                'action': 'compare',
-                'node': node,
-                'value': key,
-                'result': 'greater',
-                'path': path,
-                'message': f"{key} > {node.key}, moving to right child"
-            })
-
-            if node.right is None:
-                node.right = TreeNode(key)
-                # Log insertion
-                self.steps.append({
-                    'action': 'insert',
-                    'node': node.right,
-                    'parent': node,
-                    'direction': 'right',
-                    'path': f"{path}.right",
-                    'message': f"Right child is empty. Inserting {key} as right child of {node.key}"
-                })
+                return None
+        child = self._new_node(key, item)
+        child.red = self.balance == "red_black"
+        return ancestors, child
+
+    def _insert_iter(self, key, item):
+        """Helper method to walk down from the root and insert a new key.
+
+        Returns (ancestors, new_node), where ancestors is the list of
+        (node, went_left) pairs from the root down to the new node's parent,
+        or None if the key was a duplicate. The caller links the new node in.
+        In a multiset a duplicate returns (ancestors + [(node, False)], None)
+        instead, and the caller bumps that node's count.
+        """
+        node = self.root
+        bits, depth = 0, 0  # Path from the root: one bit per level, 1 = right
+        ancestors = []
+        while True:
+            # Log visiting this node
+            if self._trace_full:
+                self.steps.record('visit', node, path=(bits, depth))
+
+            # Log comparison
+            if key < node.key:
+                if self._trace_full:
+                    self.steps.record('compare', node, key, (bits, depth), result='less')
+
+                ancestors.append((node, True))
+                bits, depth = bits << 1, depth + 1
+                if node.left is None:
+                    child = self._new_node(key, item)
+                    child.red = self.balance == "red_black"
+                    # Log insertion
+                    self.steps.record('insert', child, key, (bits, depth), parent=node, direction='left')
+                    return ancestors, child
+                node = node.left
+
+            elif key > node.key:
+                if self._trace_full:
+                    self.steps.record('compare', node, key, (bits, depth), result='greater')
+
+                ancestors.append((node, False))
+                bits, depth = bits << 1 | 1, depth + 1
+                if node.right is None:
+                    child = self._new_node(key, item)
+                    child.red = self.balance == "red_black"
+                    # Log insertion
+                    self.steps.record('insert', child, key, (bits, depth), parent=node, direction='right')
+                    return ancestors, child
+                node = node.right
+            elif self.multiset:
+                self.steps.record('increment', node, key, (bits, depth), count=node.count + 1)
+                ancestors.append((node, False))
+                return ancestors, None
             else:
-                self._insert_rec(node.right, key, f"{path}.right")
-        else:
-            # Duplicate value
-            self.steps.append({
-                'action': 'duplicate',
-                'node': node,
-                'value': key,
-                'path': path,
-                'message': f"Value {key} already exists in the tree. Duplicates are not inserted."
-            })
+                # Duplicate value
+                self.steps.record('duplicate', node, key, (bits, depth))
+                return None
 
     def search(self, key):
         """Search for a key in the tree and record steps for visualization."""
-        self.steps = []  # Reset steps for visualization
+        self.steps = StepTrace()  # Reset steps for visualization
 
         # Log this step
-        self.steps.append({
-            'action': 'start_search',
-            'value': key,
-            'message': f"Starting search for value {key}"
-        })
+        if self._trace_summary:
+            self.steps.record('start_search', value=key)
 
-        result = self._search_rec(self.root, key)
+        key = self._probe(key)
+        result = self._search_iter(key)[1] is not None
 
         # Final step
-        if result:
-            self.steps.append({
-                'action': 'finish_search',
-                'value': key,
-                'found': True,
-                'message': f"Value {key} was found in the tree!"
-            })
-        else:
-            self.steps.append({
-                'action': 'finish_search',
-                'value': key,
-                'found': False,
-                'message': f"Value {key} was NOT found in the tree!"
-            })
+        if self._trace_summary:
+            self.steps.record('finish_search', value=key, found=result)
 
         return result, self.steps
 
-    def _search_rec(self, node, key, path="root"):
-        """Helper method to search recursively and record steps."""
-        if node is None:
-            self.steps.append({
-                'action': 'visit_null',
-                'path': path,
-                'message': f"Reached a null node. Value {key} not found in this path."
-            })
-            return False
+    def _search_iter(self, key):
+        """Helper method to walk down from the root and record search steps.
 
-        # Log visiting this node
-        self.steps.append({
-            'action': 'visit',
-            'node': node,
-            'path': path,
-            'message': f"Visiting node with value {node.key}"
-        })
-
-        if key == node.key:
-            self.steps.append({
-                'action': 'found',
-                'node': node,
-                'value': key,
-                'path': path,
-                'message': f"Found! {key} matches current node value."
-            })
-            return True
-        elif key < node.key:
-            self.steps.append({
-                'action': 'compare',
-                'node': node,
-                'value': key,
-                'result': 'less',
-                'path': path,
-                'message': f"{key} < {node.key}, moving to left child"
-            })
-            return self._search_rec(node.left, key, f"{path}.left")
-        else:
-            self.steps.append({
-                'action': 'compare',
-                'node': node,
-                'value': key,
-                'result': 'greater',
-                'path': path,
-                'message': f"{key} > {node.key}, moving to right child"
-            })
-            return self._search_rec(node.right, key, f"{path}.right")
+        Returns (ancestors, node, path): the (node, went_left) pairs above the
+        node holding key, that node (None if key is absent) and its path as a
+        (bits, depth) pair (None when tracing is off, since nothing is recorded).
+        """
+        node = self.root
+        ancestors = []
+        if not self._trace_summary:
+            while node is not None and key != node.key:
+                went_left = key < node.key
+                ancestors.append((node, went_left))
+                node = node.left if went_left else node.right
+            return ancestors, node, None
+        bits, depth = 0, 0
+        while node is not None:
+            # Log visiting this node
+            if self._trace_full:
+                self.steps.record('visit', node, path=(bits, depth))
+
+            if key == node.key:
+                self.steps.record('found', node, key, (bits, depth))
+                return ancestors, node, (bits, depth)
+            elif key < node.key:
+                if self._trace_full:
+                    self.steps.record('compare', node, key, (bits, depth), result='less')
+                ancestors.append((node, True))
+                node, bits, depth = node.left, bits << 1, depth + 1
+            else:
+                if self._trace_full:
+                    self.steps.record('compare', node, key, (bits, depth), result='greater')
+                ancestors.append((node, False))
+                node, bits, depth = node.right, bits << 1 | 1, depth + 1
+
+        self.steps.record('visit_null', value=key, path=(bits, depth))
+        return ancestors, None, (bits, depth)
+
+    # --- Lazy traversals (no steps recorded, nothing materialized) ---
+
+    def iter_nodes(self, order="inorder"):
+        """Yield the tree's nodes one at a time in the given traversal order.
+
+        Depth-first orders hold O(height) nodes at a time, level order holds
+        one level (O(width)).
+        """
+        if order == "inorder":
+            return self._inorder_nodes()
+        if order == "preorder":
+            return self._preorder_nodes()
+        if order == "postorder":
+            return self._postorder_nodes()
+        if order == "levelorder":
+            return self._levelorder_nodes()
+        raise ValueError(f"Unknown traversal order {order!r}; expected one of {tuple(TRAVERSAL_ORDERS)}")
+
+    def _inorder_nodes(self):
+        stack = []
+        node = self.root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node
+            node = node.right
+
+    def _preorder_nodes(self):
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            yield node
+            if node.right is not None:
+                stack.append(node.right)
+            if node.left is not None:
+                stack.append(node.left)
+
+    def _postorder_nodes(self):
+        stack = []
+        node = self.root
+        last = None  # Most recently yielded node, to tell if we are coming back up from the right
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            top = stack[-1]
+            if top.right is not None and top.right != last:
+                node = top.right
+            else:
+                last = stack.pop()
+                yield last
+
+    def _levelorder_nodes(self):
+        queue = deque([self.root] if self.root is not None else [])
+        while queue:
+            node = queue.popleft()
+            yield node
+            if node.left is not None:
+                queue.append(node.left)
+            if node.right is not None:
+                queue.append(node.right)
+
+    def iter_inorder(self):
+        """Yield keys in sorted (in-order) order."""
+        return (node.item for node in self._inorder_nodes())
+
+    def iter_preorder(self):
+        """Yield keys in pre-order (Root -> Left -> Right)."""
+        return (node.item for node in self._preorder_nodes())
+
+    def iter_postorder(self):
+        """Yield keys in post-order (Left -> Right -> Root)."""
+        return (node.item for node in self._postorder_nodes())
+
+    def iter_levelorder(self):
+        """Yield keys level by level, top to bottom."""
+        return (node.item for node in self._levelorder_nodes())
+
+    def __iter__(self):
+        if self.multiset:
+            return self.elements()
+        return self.iter_inorder()
+
+    def elements(self):
+        """Yield every key in sorted order, repeated once per copy held."""
+        for node in self._inorder_nodes():
+            for _ in range(node.count):
+                yield node.item
+
+    # --- Ordered queries (O(log n), plus O(k) for the keys a range yields) ---
+
+    def range(self, lo, hi, record=False):
+        """Lazily yield the keys with lo <= key <= hi in ascending order, once per copy in a multiset.
+
+        With record=True, self.steps is reset and filled with animation steps
+        as the keys are consumed.
+        """
+        return self._copies_of(self._nodes_from(lo, hi, record))
+
+    def iter_from(self, key, record=False):
+        """Lazily yield the keys >= key in ascending order, once per copy in a multiset."""
+        return self._copies_of(self._nodes_from(key, None, record))
+
+    @staticmethod
+    def _copies_of(nodes):
+        """Yield each node's item once per copy it holds, like elements()."""
+        for node in nodes:
+            for _ in range(node.count):
+                yield node.item
+
+    def _nodes_from(self, lo, hi, record):
+        """Yield nodes with lo <= key (<= hi unless hi is None) via a stack seeded by one descent."""
+        lo = self._probe(lo)
+        if hi is not None:
+            hi = self._probe(hi)
+        if record:
+            self.steps = StepTrace()
+            self.steps.record('start_range', value=lo, high=hi)
+        # Descend towards lo, stacking every node that is >= lo: exactly the
+        # nodes an in-order traversal starting at lo still has to visit
+        stack = []
+        node = self.root
+        while node is not None:
+            if record:
+                self.steps.record('visit', node)
+            if node.key < lo:
+                node = node.right
+            else:
+                stack.append(node)
+                node = node.left
+
+        count = 0
+        while stack:
+            node = stack.pop()
+            if hi is not None and node.key > hi:
+                break
+            if record:
+                self.steps.record('visit_range', node)
+            count += node.count
+            yield node
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
+
+        if record:
+            self.steps.record('finish_range', value=lo, high=hi, count=count)
+
+    def floor(self, key, record=False):
+        """Return the largest key <= key, or None."""
+        return self._bound(key, below=True, inclusive=True, record=record)
+
+    def ceiling(self, key, record=False):
+        """Return the smallest key >= key, or None."""
+        return self._bound(key, below=False, inclusive=True, record=record)
+
+    def predecessor(self, key, record=False):
+        """Return the largest key < key, or None."""
+        return self._bound(key, below=True, inclusive=False, record=record)
+
+    def successor(self, key, record=False):
+        """Return the smallest key > key, or None."""
+        return self._bound(key, below=False, inclusive=False, record=record)
+
+    def _bound(self, key, below, inclusive, record):
+        """Walk down once, remembering the closest key seen on the requested side of key."""
+        key = self._probe(key)
+        name = {(True, True): "floor", (False, True): "ceiling",
+                (True, False): "predecessor", (False, False): "successor"}[below, inclusive]
+        if record:
+            self.steps = StepTrace()
+            self.steps.record('start_query', value=key, query=name)
+        best = None
+        node = self.root
+        while node is not None:
+            if record:
+                self.steps.record('visit', node)
+            if below:
+                on_side = node.key <= key if inclusive else node.key < key
+            else:
+                on_side = node.key >= key if inclusive else node.key > key
+            if on_side:
+                # A candidate; anything closer lies further towards key
+                best = node
+                node = node.right if below else node.left
+            else:
+                node = node.left if below else node.right
+        if record:
+            self.steps.record('query_result', best, key, query=name)
+        return best.item if best is not None else None
+
+    # --- Traversals with visualization steps ---
 
     def inorder_traversal(self):
         """Public method to start in-order traversal with visualization steps."""
-        self.steps = []  # Reset steps
+        return self._ordered_traversal("inorder")
 
-        self.steps.append({
-            'action': 'start_traversal',
-            'message': "Starting in-order traversal (Left -> Root -> Right)"
-        })
+    def preorder_traversal(self):
+        """Pre-order traversal (Root -> Left -> Right) with visualization steps."""
+        return self._ordered_traversal("preorder")
 
-        result = self._inorder_traversal_rec(self.root)
+    def postorder_traversal(self):
+        """Post-order traversal (Left -> Right -> Root) with visualization steps."""
+        return self._ordered_traversal("postorder")
 
-        self.steps.append({
-            'action': 'finish_traversal',
-            'result': result,
-            'message': f"In-order traversal completed: {result}"
-        })
+    def levelorder_traversal(self):
+        """Level-order traversal (top to bottom, left to right) with visualization steps."""
+        return self._ordered_traversal("levelorder")
+
+    def _ordered_traversal(self, order):
+        """Record a step for every move of an in-, pre-, post- or level-order traversal."""
+        self.steps = StepTrace()  # Reset steps
+        if not self._trace_full:
+            return self._untraced_traversal(order)
+
+        self.steps.record('start_traversal', order=order)
+        visit = f'visit_{order}'
+        result = []
+        for action, node, path in self._traversal_walk(order):
+            self.steps.record(action, node, path=path)
+            if action == visit:
+                result.append(node.item)
+        self.steps.record('finish_traversal', order=order, result=result)
 
         return result, self.steps
 
-    def _inorder_traversal_rec(self, node, path="root"):
-        """Private recursive helper for in-order traversal with steps."""
-        if node is None:
-            return []
+    def traversal_steps(self, order="inorder"):
+        """Yield the steps of a fully traced traversal one at a time, as the walk reaches them.
 
+        Unlike inorder_traversal() and friends nothing is recorded in
+        self.steps, whatever the trace level: the first step is ready at once
+        and only the walk's stack is held, so playback (see StepStream) does
+        not wait on the size of the tree. The finish step carries the result.
+        """
+        if order not in TRAVERSAL_ORDERS:
+            raise ValueError(f"Unknown traversal order {order!r}; expected one of {tuple(TRAVERSAL_ORDERS)}")
+        yield make_step('start_traversal', order=order)
+        visit = f'visit_{order}'
         result = []
+        for action, node, path in self._traversal_walk(order):
+            if action == visit:
+                result.append(node.item)
+            yield make_step(action, node, path=path)
+        yield make_step('finish_traversal', order=order, result=result)
+
+    def _untraced_traversal(self, order):
+        """Traversal for the "off" and "summary" trace levels: no visit steps, no paths."""
+        result = [node.item for node in self.iter_nodes(order)]
+        if self._trace_summary:
+            self.steps.record('start_traversal', order=order)
+            self.steps.record('finish_traversal', order=order, result=result)
+        return result, self.steps
 
-        # Record step before going left
-        if node.left is not None:
-            self.steps.append({
-                'action': 'traverse_left',
-                'node': node,
-                'path': path,
-                'message': f"At node {node.key}, traversing left subtree first"
-            })
-
-        # Traverse left
-        result.extend(self._inorder_traversal_rec(node.left, f"{path}.left"))
-
-        # Visit node
-        self.steps.append({
-            'action': 'visit_inorder',
-            'node': node,
-            'path': path,
-            'message': f"Visiting node {node.key} in in-order traversal"
-        })
-        result.append(node.key)
+    def _traversal_walk(self, order):
+        """Yield (action, node, (bits, depth)) for every step a traced traversal records."""
+        if order == "inorder":
+            yield from self._inorder_walk()
+            return
+        action = f'visit_{order}'
+        for node, path in self._paths_in_order(order):
+            yield action, node, path
 
-        # Record step before going right
-        if node.right is not None:
-            self.steps.append({
-                'action': 'traverse_right',
-                'node': node,
-                'path': path,
-                'message': f"At node {node.key}, traversing right subtree now"
-            })
+    def _paths_in_order(self, order):
+        """Yield (node, (bits, depth)) pairs in pre-, post- or level-order."""
+        if self.root is None:
+            return
+        if order == "levelorder":
+            queue = deque([(self.root, 0, 0)])
+            while queue:
+                node, bits, depth = queue.popleft()
+                yield node, (bits, depth)
+                if node.left is not None:
+                    queue.append((node.left, bits << 1, depth + 1))
+                if node.right is not None:
+                    queue.append((node.right, bits << 1 | 1, depth + 1))
+            return
+        # Depth-first: a node is pushed once to expand it and, for post-order,
+        # once more to be visited after both of its subtrees
+        stack = [(self.root, 0, 0, False)]
+        while stack:
+            node, bits, depth, expanded = stack.pop()
+            if expanded:
+                yield node, (bits, depth)
+                continue
+            if order == "postorder":
+                stack.append((node, bits, depth, True))
+            if node.right is not None:
+                stack.append((node.right, bits << 1 | 1, depth + 1, False))
+            if node.left is not None:
+                stack.append((node.left, bits << 1, depth + 1, False))
+            if order == "preorder":
+                yield node, (bits, depth)
+
+    def _inorder_walk(self):
+        """Private stack-based helper for in-order traversal steps."""
+        stack = []
+        node, bits, depth = self.root, 0, 0
+        while stack or node is not None:
+            # Walk as far left as possible, remembering the nodes we pass
+            while node is not None:
+                # Record step before going left
+                if node.left is not None:
+                    yield 'traverse_left', node, (bits, depth)
+                stack.append((node, bits, depth))
+                node, bits, depth = node.left, bits << 1, depth + 1
+
+            node, bits, depth = stack.pop()
+
+            # Visit node
+            yield 'visit_inorder', node, (bits, depth)
+
+            # Record step before going right
+            if node.right is not None:
+                yield 'traverse_right', node, (bits, depth)
+
+            # Traverse right
+            node, bits, depth = node.right, bits << 1 | 1, depth + 1
+
+    def delete(self, key):
+        """Delete a key from the tree and record steps for visualization.
+
+        Returns (deleted, steps). A node with two children is replaced by its
+        in-order successor, which is spliced out of the right subtree during
+        the same root-to-leaf walk, so every delete is a single pass. In a
+        multiset every copy of the key is removed; see remove_one().
+        """
+        return self._delete(key, one=False)
 
-        # Traverse right
-        result.extend(self._inorder_traversal_rec(node.right, f"{path}.right"))
+    def remove_one(self, key):
+        """Remove a single copy of key; the node goes only with its last copy. Returns (removed, steps)."""
+        return self._delete(key, one=True)
 
-        return result
+    def _delete(self, key, one):
+        """Shared body of delete() and remove_one()."""
+        key = self._probe(key)
+        self.steps = StepTrace()  # Reset steps for visualization
+        self._copies = {}
 
-    def get_height(self):
-        """Calculate the height of the tree."""
-        return self._get_height_rec(self.root)
+        # Log this step
+        if self._trace_summary:
+            self.steps.record('start_delete', value=key)
 
-    def _get_height_rec(self, node):
-        """Recursive helper to calculate height."""
+        path, node, where = self._search_iter(key)
         if node is None:
+            if self._trace_summary:
+                self.steps.record('finish_delete', value=key, deleted=False)
+            if self.persistent:
+                self._finish_version()
+            return False, self.steps
+
+        if one and node.count > 1:
+            path.append((node, False))
+            if self.persistent:
+                path = self._copy_path(path)
+            node = path[-1][0]
+            node.count -= 1
+            self._update_path(path)
+            if self._trace_summary:
+                self.steps.record('decrement', node, key, count=node.count)
+                self.steps.record('finish_delete', value=key, deleted=True, one_copy=True)
+            if self.persistent:
+                self._finish_version()
+            return True, self.steps
+        self._snapshot = None
+
+        successor = None
+        if node.left is not None and node.right is not None:
+            # Two children: the in-order successor (leftmost node on the right) takes its place
+            target = len(path)
+            path.append((node, False))
+            successor = node.right
+            while successor.left is not None:
+                if self._trace_full:
+                    self.steps.record('visit_successor', successor, key, self._successor_path(where, path, target))
+                path.append((successor, True))
+                successor = successor.left
+            if self._trace_summary:
+                self.steps.record('successor_found', successor, key, self._successor_path(where, path, target))
+        if self.persistent:
+            self.steps.stamp(self.root)  # The walk above happened on the previous version
+            path = self._copy_path(path)
+
+        if successor is not None:
+            # The successor has no left child: hand its right child to its parent,
+            # then give it the deleted node's children, color and position
+            node = path[target][0]
+            successor = self._own(successor)
+            removed_red = successor.red
+            child = successor.right
+            if child is not None and child.red:
+                child = self._own(child)  # It may be recolored black below
+            self._link(path[-1], child)
+            successor.left, successor.right = node.left, node.right
+            successor.red = node.red
+            self._link(path[target - 1] if target else None, successor)
+            path[target] = (successor, False)
+            self._depths_valid = False
+            if self._trace_summary:
+                self.steps.record('splice', successor, key)
+        else:
+            # 'node' has at most one child, which takes its place
+            removed_red = node.red
+            child = node.left if node.left is not None else node.right
+            if child is not None and child.red:
+                child = self._own(child)  # It may be recolored black below
+            self._link(path[-1] if path else None, child)
+            if child is not None:
+                # The child's whole subtree moved up a level
+                self._depths_valid = False
+            if self._trace_summary:
+                self.steps.record('remove', child, key)
+        if self.store is not None:
+            self.store.release(node)
+
+        if self.balance == "avl":
+            self._avl_fix_path(path)
+        else:
+            self._update_path(path)
+            if self.balance == "red_black" and not removed_red:
+                if child is not None and child.red:
+                    self._recolor(child, False)
+                else:
+                    self._rb_fix_delete(path)
+                    self._update_path(path)
+
+        # Final step
+        if self._trace_summary:
+            self.steps.record('finish_delete', value=key, deleted=True)
+
+        if self.persistent:
+            self._finish_version()
+        return True, self.steps
+
+    @staticmethod
+    def _successor_path(where, path, target):
+        """(bits, depth) of the node reached after one step right and the rest left from where."""
+        bits, depth = where
+        lefts = len(path) - target - 1
+        return (bits << 1 | 1) << lefts, depth + 1 + lefts
+
+    # --- Persistence helpers (path copying) ---
+
+    def _own(self, node):
+        """Return a node the running mutation may change: a private copy in persistent mode.
+
+        A fresh copy is not linked in yet; the caller attaches it where the original was.
+        """
+        if not self.persistent or node is None:
+            return node
+        if node not in self._copies:
+            clone = copy.copy(node)
+            self._copies[node] = self._copies[clone] = clone
+        return self._copies[node]
+
+    def _own_child(self, parent, left):
+        """Make parent's left (or right) child changeable and link it back in; parent must be owned."""
+        child = parent.left if left else parent.right
+        owned = self._own(child)
+        if owned is not child:
+            if left:
+                parent.left = owned
+            else:
+                parent.right = owned
+        return owned
+
+    def _copy_path(self, path):
+        """Replace every node on a (node, went_left) path from the root with its own copy."""
+        copied = []
+        for node, went_left in path:
+            node = self._own(node)
+            self._link(copied[-1] if copied else None, node)
+            copied.append((node, went_left))
+        return copied
+
+    def _finish_version(self):
+        """Point this operation's steps at its copies and stamp them with the new version's root.
+
+        Steps already stamped (taken on the previous version) are left alone.
+        """
+        self.steps.stamp(self.root, self._copies)
+        if self.versions[-1] is not self.root:
+            self.versions.append(self.root)
+        self._copies = {}
+
+    def at_version(self, root):
+        """Return a tree over an earlier version's root (from versions or a step's 'root').
+
+        The view is persistent too, so changing it never touches this tree.
+        Like every persistent tree it keeps its depths to itself rather than
+        in the shared nodes' cached_depth, so neither tree's depths can go
+        stale through the other, and making a view writes nothing to this tree.
+        """
+        view = BinarySearchTree(balance=self.balance, persistent=True, multiset=self.multiset, key=self.key_func,
+                                trace=self.trace)
+        view.root = view.versions[0] = root
+        view._depths_valid = False
+        return view
+
+    # --- Balancing helpers ---
+
+    def _link(self, parent_entry, child):
+        """Attach child where a path entry points: (parent, went_left), or the root if None."""
+        if parent_entry is None:
+            self.root = child
+        else:
+            parent, went_left = parent_entry
+            if went_left:
+                parent.left = child
+            else:
+                parent.right = child
+
+    @staticmethod
+    def _node_height(node):
+        return node.height if node is not None else 0
+
+    @staticmethod
+    def _node_size(node):
+        return node.size if node is not None else 0
+
+    def _update(self, node):
+        """Recompute a node's height and subtree size from its children."""
+        node.height = 1 + max(self._node_height(node.left), self._node_height(node.right))
+        node.size = node.count + self._node_size(node.left) + self._node_size(node.right)
+
+    def _update_path(self, path):
+        """Recompute heights and sizes from the bottom of a (node, went_left) path up to the root."""
+        for node, _ in reversed(path):
+            self._update(node)
+
+    def _rotate_left(self, node):
+        """Rotate node's right child up into its place and return the new subtree root."""
+        node = self._own(node)
+        pivot = self._own(node.right)
+        node.right = pivot.left
+        pivot.left = node
+        self._update(node)
+        self._update(pivot)
+        self._depths_valid = False
+        if self._trace_summary:
+            self.steps.record('rotate_left', node, pivot=pivot)
+        return pivot
+
+    def _rotate_right(self, node):
+        """Rotate node's left child up into its place and return the new subtree root."""
+        node = self._own(node)
+        pivot = self._own(node.left)
+        node.left = pivot.right
+        pivot.right = node
+        self._update(node)
+        self._update(pivot)
+        self._depths_valid = False
+        if self._trace_summary:
+            self.steps.record('rotate_right', node, pivot=pivot)
+        return pivot
+
+    def _avl_fix_path(self, path):
+        """Walk back up a (node, went_left) path, updating heights and rotating where AVL balance is broken."""
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i][0]
+            self._update(node)
+            balance = self._node_height(node.left) - self._node_height(node.right)
+            if balance > 1:
+                if self._node_height(node.left.left) < self._node_height(node.left.right):
+                    node.left = self._rotate_left(node.left)
+                subtree = self._rotate_right(node)
+            elif balance < -1:
+                if self._node_height(node.right.right) < self._node_height(node.right.left):
+                    node.right = self._rotate_right(node.right)
+                subtree = self._rotate_left(node)
+            else:
+                continue
+            self._link(path[i - 1] if i > 0 else None, subtree)
+
+    def _recolor(self, node, red):
+        node.red = red
+        if self._trace_summary:
+            self.steps.record('recolor', node, red=red)
+
+    def _rb_fix_insert(self, path, node):
+        """Restore red-black properties after node (red) was attached below path[-1]."""
+        i = len(path) - 1  # index of node's parent in path
+        while i >= 0 and path[i][0].red:
+            # A red parent is never the root, so the grandparent is path[i - 1]
+            parent, node_is_left = path[i]
+            grandparent, parent_is_left = path[i - 1]
+            uncle = grandparent.right if parent_is_left else grandparent.left
+            if uncle is not None and uncle.red:
+                # Red uncle: push the blackness down from the grandparent and continue above it
+                uncle = self._own_child(grandparent, not parent_is_left)
+                self._recolor(parent, False)
+                self._recolor(uncle, False)
+                self._recolor(grandparent, True)
+                i -= 2
+                continue
+            # Black uncle: one or two rotations finish the repair
+            if parent_is_left:
+                if not node_is_left:
+                    grandparent.left = self._rotate_left(parent)
+                subtree = self._rotate_right(grandparent)
+            else:
+                if node_is_left:
+                    grandparent.right = self._rotate_right(parent)
+                subtree = self._rotate_left(grandparent)
+            self._recolor(subtree, False)
+            self._recolor(grandparent, True)
+            self._link(path[i - 2] if i > 1 else None, subtree)
+            break
+        if self.root.red:
+            self._recolor(self.root, False)
+            return True  # The whole tree's black height grew by one
+        return False
+
+    def _rb_fix_delete(self, path):
+        """Restore red-black properties after a black node was unlinked below path[-1]."""
+        i = len(path) - 1  # the "doubly black" position is a child of path[i]
+        while i >= 0:
+            parent, is_left = path[i]
+            child = parent.left if is_left else parent.right
+            if child is not None and child.red:
+                self._recolor(self._own_child(parent, is_left), False)
+                return
+            sibling = self._own_child(parent, not is_left)
+            if sibling.red:
+                # Red sibling: rotate it above the parent so the new sibling is black
+                self._recolor(sibling, False)
+                self._recolor(parent, True)
+                subtree = self._rotate_left(parent) if is_left else self._rotate_right(parent)
+                self._link(path[i - 1] if i > 0 else None, subtree)
+                path[i:i] = [(subtree, is_left)]
+                i += 1
+                sibling = self._own_child(parent, not is_left)
+            near = sibling.left if is_left else sibling.right
+            far = sibling.right if is_left else sibling.left
+            if (near is None or not near.red) and (far is None or not far.red):
+                # Black sibling with black children: recolor and move the problem up
+                self._recolor(sibling, True)
+                if parent.red:
+                    self._recolor(parent, False)
+                    return
+                i -= 1
+                continue
+            if far is None or not far.red:
+                # Near nephew red: rotate it above the sibling so the far nephew is red
+                self._recolor(self._own_child(sibling, is_left), False)
+                self._recolor(sibling, True)
+                if is_left:
+                    parent.right = sibling = self._rotate_right(sibling)
+                else:
+                    parent.left = sibling = self._rotate_left(sibling)
+            # Far nephew red: one rotation at the parent finishes the repair
+            far = self._own_child(sibling, not is_left)
+            self._recolor(sibling, parent.red)
+            self._recolor(parent, False)
+            self._recolor(far, False)
+            subtree = self._rotate_left(parent) if is_left else self._rotate_right(parent)
+            self._link(path[i - 1] if i > 0 else None, subtree)
+            return
+
+    # --- Split, join and merge ---
+
+    def _empty_like(self):
+        """Return an empty tree with this tree's settings, sharing its node store."""
+        return BinarySearchTree(balance=self.balance, storage=self.store if self.store is not None else "objects",
+                                persistent=self.persistent, multiset=self.multiset, key=self.key_func,
+                                trace=self.trace)
+
+    def _tree_with_root(self, root):
+        """Return a tree with this tree's settings over an existing root."""
+        tree = self._empty_like()
+        tree.root = root
+        tree._depths_valid = False
+        if tree.persistent:
+            tree.versions = [root]
+        return tree
+
+    @staticmethod
+    def _black_height(node):
+        """Count the black nodes on the path from node down its left spine (any path gives the same count)."""
+        height = 0
+        while node is not None:
+            height += not node.red
+            node = node.left
+        return height
+
+    def _join3(self, left, mid, right, left_bh=0, right_bh=0):
+        """Link left, the single node mid and right (keys in that order) into one valid tree.
+
+        Returns (root, black height); black heights are only used by
+        red-black trees. Only the taller tree's inner spine is walked, down
+        to a subtree as tall as the other tree, so the cost is the
+        difference in heights.
+        """
+        mid = self._own(mid)
+        if self.balance == "red_black":
+            return self._rb_join3(left, mid, right, left_bh, right_bh)
+        left_height, right_height = self._node_height(left), self._node_height(right)
+        if self.balance == "none" or abs(left_height - right_height) <= 1:
+            mid.left, mid.right = left, right
+            self._update(mid)
+            return mid, 0
+        # AVL: hang mid (with the shorter tree) off the taller tree's inner
+        # spine, where the subtree is at most one level taller, then rebalance
+        went_left = right_height > left_height
+        self.root = right if went_left else left
+        target = min(left_height, right_height) + 1
+        path = []
+        node = self.root
+        while self._node_height(node) > target:
+            path.append((node, went_left))
+            node = node.left if went_left else node.right
+        if self.persistent:
+            path = self._copy_path(path)
+        mid.left, mid.right = (left, node) if went_left else (node, right)
+        self._update(mid)
+        self._link(path[-1], mid)
+        self._avl_fix_path(path)
+        return self.root, 0
+
+    def _rb_join3(self, left, mid, right, left_bh, right_bh):
+        """Red-black _join3(): match black heights instead of heights."""
+        if left is not None and left.red:
+            left = self._own(left)
+            left.red = False
+            left_bh += 1
+        if right is not None and right.red:
+            right = self._own(right)
+            right.red = False
+            right_bh += 1
+        if left_bh == right_bh:
+            mid.left, mid.right, mid.red = left, right, False
+            self._update(mid)
+            return mid, left_bh + 1
+        # Hang mid, colored red, off the taller tree's inner spine at the first
+        # black node with the shorter tree's black height, then repair as if inserted
+        went_left = right_bh > left_bh
+        self.root = right if went_left else left
+        target = min(left_bh, right_bh)
+        bh = max(left_bh, right_bh)
+        path = []
+        node = self.root
+        while node is not None and (node.red or bh > target):
+            bh -= not node.red
+            path.append((node, went_left))
+            node = node.left if went_left else node.right
+        if self.persistent:
+            path = self._copy_path(path)
+        mid.left, mid.right = (left, node) if went_left else (node, right)
+        mid.red = True
+        self._update(mid)
+        self._link(path[-1], mid)
+        self._update_path(path)
+        grew = self._rb_fix_insert(path, mid)
+        self._update_path(path)
+        return self.root, max(left_bh, right_bh) + grew
+
+    def split(self, key):
+        """Split into two trees, keys below key and keys from key up, in O(log n) for balanced trees.
+
+        The nodes move into the two results and this tree is left empty; a
+        persistent tree keeps its current version instead. No visualization
+        steps are recorded.
+        """
+        key = self._probe(key)
+        work = self._empty_like()
+        # Walk down towards key; every node on the way belongs to one side
+        # along with its subtree on that side
+        path = []
+        bh = self._black_height(self.root) if self.balance == "red_black" else 0
+        node = self.root
+        while node is not None:
+            went_left = not node.key < key
+            path.append((node, went_left, bh))
+            bh -= not node.red
+            node = node.left if went_left else node.right
+        # Rebuild both sides bottom-up, joining each node onto the side it belongs to
+        left = right = None
+        left_bh = right_bh = 0
+        for node, went_left, bh in reversed(path):
+            child_bh = bh - (not node.red)
+            if went_left:
+                right, right_bh = work._join3(right, node, node.right, right_bh, child_bh)
+            else:
+                left, left_bh = work._join3(node.left, node, left, child_bh, left_bh)
+        if not self.persistent:
+            self.root = None
+            self._snapshot = None
+        return self._tree_with_root(left), self._tree_with_root(right)
+
+    @classmethod
+    def join(cls, left, right):
+        """Concatenate two trees, every key in left below every key in right, in O(log n).
+
+        Both trees need the same balance policy, node store and key settings.
+        Their nodes move into the result and both are left empty; persistent
+        trees keep their versions instead.
+        """
+        if (left.balance, left.store, left.multiset, left.key_func) != (right.balance, right.store, right.multiset,
+                                                                         right.key_func):
+            raise ValueError("join() needs two trees with the same balance policy, node store and key settings")
+        if left.root is None or right.root is None:
+            root = left.root if left.root is not None else right.root
+        else:
+            highest, lowest = left.root, right.root
+            while highest.right is not None:
+                highest = highest.right
+            while lowest.left is not None:
+                lowest = lowest.left
+            if not highest.key < lowest.key:
+                raise ValueError(f"join() needs every key in left below every key in right, got {highest.key!r} "
+                                 f"and {lowest.key!r}")
+            # Take the smallest node out of right and use it to link the two trees
+            key, item, count = lowest.key, lowest.item, lowest.count
+            work = left._empty_like()
+            work.root = right.root
+            work.delete(key)
+            mid = work._new_node(key, item)
+            mid.count = count
+            left_bh = right_bh = 0
+            if left.balance == "red_black":
+                left_bh, right_bh = cls._black_height(left.root), cls._black_height(work.root)
+            root = work._join3(left.root, mid, work.root, left_bh, right_bh)[0]
+        result = left._tree_with_root(root)
+        if not left.persistent:
+            left.root = right.root = None
+            left._snapshot = right._snapshot = None
+        return result
+
+    @classmethod
+    def merge(cls, a, b):
+        """Return a new tree holding the keys of both trees, in O(n + m).
+
+        The two in-order streams are merged in one pass and the result is
+        bulk-built with from_sorted(), so the inputs are left untouched and
+        no steps are recorded. The result takes a's settings; a key in both
+        trees is kept once (a multiset adds up the copies).
+        """
+        return cls.from_sorted(heapq.merge(a, b, key=a.key_func), balance=a.balance,
+                               storage="arrays" if a.store is not None else "objects",
+                               persistent=a.persistent, multiset=a.multiset, key=a.key_func, trace=a.trace)
+
+    # --- Order statistics (use the subtree sizes kept on every node) ---
+
+    def _rank(self, key, inclusive):
+        """Count keys below key (or at most key when inclusive) with one root-to-leaf walk."""
+        key = self._probe(key)
+        count = 0
+        node = self.root
+        while node is not None:
+            if key < node.key or (key == node.key and not inclusive):
+                node = node.left
+            else:
+                count += self._node_size(node.left) + node.count
+                node = node.right
+        return count
+
+    def rank(self, key):
+        """Return how many keys in the tree are smaller than key."""
+        return self._rank(key, inclusive=False)
+
+    def select(self, k):
+        """Return the k-th smallest key (0-based)."""
+        if not 0 <= k < len(self):
+            raise IndexError(f"select index {k} out of range for a tree of {len(self)} keys")
+        node = self.root
+        while True:
+            left_size = self._node_size(node.left)
+            if k < left_size:
+                node = node.left
+            elif k < left_size + node.count:
+                return node.item
+            else:
+                k -= left_size + node.count
+                node = node.right
+
+    def count(self, key):
+        """Return how many copies of key the tree holds (at most 1 unless it is a multiset)."""
+        key = self._probe(key)
+        node = self.root
+        while node is not None:
+            if key == node.key:
+                return node.count
+            node = node.left if key < node.key else node.right
+        return 0
+
+    def count_range(self, lo, hi):
+        """Return how many keys lie between lo and hi, inclusive."""
+        if hi < lo:
             return 0
-        left_height = self._get_height_rec(node.left)
-        right_height = self._get_height_rec(node.right)
-        return max(left_height, right_height) + 1
+        return self._rank(hi, inclusive=True) - self._rank(lo, inclusive=False)
+
+    def freeze(self, layout="eytzinger"):
+        """Return an immutable NumPy snapshot of the current keys (and a multiset's counts) for batch lookups."""
+        nodes = list(self._inorder_nodes())
+        counts = [node.count for node in nodes] if self.multiset else None
+        return FrozenTree([node.key for node in nodes], layout=layout, counts=counts)
+
+    def use_lookup_layout(self, layout):
+        """Choose how `key in tree` is answered: "pointer", "eytzinger" or "veb".
+
+        The static layouts suit lookup-heavy phases: writes still go to the
+        nodes and just mark the snapshot stale, and the next lookup rebuilds it.
+        """
+        if layout != "pointer" and layout not in STATIC_LAYOUTS:
+            raise ValueError(f"Unknown lookup layout {layout!r}; expected 'pointer' or one of {STATIC_LAYOUTS}")
+        self.lookup_layout = layout
+        self._snapshot = None
+
+    # --- Binary files ---
+
+    def _export_store(self):
+        """Return an ArrayNodeStore holding this tree and the root's index in it.
+
+        Array trees are written as they are; object trees are copied into a
+        fresh store first, children before parents.
+        """
+        if self.store is not None:
+            return self.store, self.root._index if self.root is not None else -1
+        store = ArrayNodeStore()
+        handles = {None: None}
+        for node in self._postorder_nodes():
+            handle = store.new_node(node.key)
+            handle.left, handle.right = handles[node.left], handles[node.right]
+            handle.height, handle.size, handle.count = node.height, node.size, node.count
+            handle.cached_depth, handle.red = node.cached_depth, node.red
+            handles[node] = handle
+        return store, handles[self.root]._index if self.root is not None else -1
+
+    def save(self, path):
+        """Write the tree to a compact binary file that load() can memory-map.
+
+        The file holds the key column (int64 or float64), the child index
+        columns and the height/size/depth augmentations; counts are only
+        written for multisets and colors only for red-black trees. Keys must
+        be ints or floats, and trees with a key function other than int or
+        float cannot be saved since their items would be lost. Ints mixed
+        with floats are written as float64, so each must be exact as a float.
+        """
+        if self.key_func is not None and self._scalar is None:
+            raise ValueError("save() only supports trees without a key function or with key=int / key=float")
+        store, root = self._export_store()
+        keys = store.keys
+        if not isinstance(keys, (array, memoryview)):
+            typecode = 'q' if all(type(key) is int for key in keys) else 'd'
+            try:
+                if typecode == 'd':
+                    # A rounded int would reload as another key, possibly equal to its neighbor
+                    inexact = next((key for key in keys if type(key) is int and float(key) != key), None)
+                    if inexact is not None:
+                        raise ValueError(f"save() cannot write the int key {inexact!r} next to float keys: "
+                                         "float64 would round it")
+                keys = array(typecode, keys)
+            except (TypeError, OverflowError):
+                raise ValueError("save() needs int keys in the int64 range or float keys") from None
+        # A persistent tree's depths are not in the nodes' cached_depth
+        depths_valid = self._depths_valid and self._version_depths is None
+        flags = ((TREE_FILE_MULTISET if self.multiset else 0) | (TREE_FILE_DEPTHS_VALID if depths_valid else 0)
+                 | (TREE_FILE_COLORS if self.balance == "red_black" else 0))
+        free = array('i', store._free)
+        columns = [keys, store.left, store.right, store.height, store.size, store.cached_depth]
+        if self.multiset:
+            columns.append(store.count)
+        columns.append(free)
+        if flags & TREE_FILE_COLORS:
+            columns.append(store.red)
+        header = TREE_FILE_HEADER.pack(TREE_FILE_MAGIC, BALANCE_POLICIES.index(self.balance),
+                                       TREE_FILE_KEY_FUNCS.index(self.key_func), flags,
+                                       (keys.typecode if isinstance(keys, array) else keys.format).encode(),
+                                       len(store.left), root, len(free))
+        # Written beside the target and moved over it, so a tree loaded from
+        # the same path keeps its mapping of the old file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(header)
+            for column in columns:
+                data = memoryview(column).cast('B')
+                file.write(data)
+                file.write(bytes(-len(data) % 8))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Open a tree written by save() without reading it: the columns are views into a memory map.
+
+        Nothing is parsed or re-inserted, so opening takes the same time
+        for any size and pages are read in as nodes are visited. Writes go
+        to a private copy-on-write mapping and never reach the file; the
+        first insert that needs a new slot copies the columns into arrays.
+        Every column supports the buffer protocol, so np.frombuffer(column)
+        is a zero-copy NumPy view. The tree uses array storage and is not
+        persistent.
+        """
+        with open(path, "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        view = memoryview(mapping)
+        if len(view) < TREE_FILE_HEADER.size or bytes(view[:len(TREE_FILE_MAGIC)]) != TREE_FILE_MAGIC:
+            raise ValueError(f"{path!r} is not a tree file written by save()")
+        _, balance, key_func, flags, typecode, slots, root, free = TREE_FILE_HEADER.unpack_from(view)
+        typecode = typecode.decode()
+        offset = TREE_FILE_HEADER.size
+
+        def column(fmt, length):
+            nonlocal offset
+            nbytes = length * struct.calcsize(fmt)
+            data = view[offset:offset + nbytes].cast(fmt)
+            offset += nbytes + -nbytes % 8
+            return data
+
+        store = ArrayNodeStore(typecode)
+        store.keys = column(typecode, slots)
+        store.left, store.right, store.height, store.size, store.cached_depth = (column('i', slots) for _ in range(5))
+        if flags & TREE_FILE_MULTISET:
+            store.count = column('i', slots)
+        else:
+            store.count = array('i', [1]) * slots
+        store._free = column('i', free).tolist()
+        store.red = column('B', slots) if flags & TREE_FILE_COLORS else bytearray(slots)
+
+        tree = cls(balance=BALANCE_POLICIES[balance], storage=store, multiset=bool(flags & TREE_FILE_MULTISET),
+                   key=TREE_FILE_KEY_FUNCS[key_func])
+        tree.root = ArrayNode(store, root) if root >= 0 else None
+        tree._depths_valid = bool(flags & TREE_FILE_DEPTHS_VALID)
+        return tree
+
+    # --- Node export ---
+
+    def iter_node_records(self, root=None):
+        """Yield one row per node (see EXPORT_COLUMNS) in pre-order, below root or the tree's root."""
+        stack = [(root if root is not None else self.root, 0, "root")]
+        if stack[0][0] is None:
+            return
+        while stack:
+            node, depth, path = stack.pop()
+            yield (node.key, depth, path, node.left is None and node.right is None,
+                   node.left is not None, node.right is not None, node.size)
+            if node.right is not None:
+                stack.append((node.right, depth + 1, f"{path}.right"))
+            if node.left is not None:
+                stack.append((node.left, depth + 1, f"{path}.left"))
+
+    def export_nodes(self, path, fmt="csv", progress=None, stop=None, batch=10_000):
+        """Stream one row per node into a file in a single pass; return the row count, or None if stopped.
+
+        fmt is one of EXPORT_FORMATS: "csv", "jsonl" (one JSON object per
+        line) or "columnar" (an .npz archive holding one NumPy array per
+        column; each batch's columns are spooled to disk beside path and
+        copied into the archive at the end, see _write_npz_columns()).
+        Rows are written in batches; after each one progress(rows)
+        is called and stop (a threading.Event) is checked, so this can run
+        on a worker thread. The root is read once at the start; a persistent
+        tree never changes those nodes, so it may keep changing meanwhile.
+        The file is written beside path and only moved there when complete.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r}; expected one of {tuple(EXPORT_FORMATS)}")
+        records = self.iter_node_records(self.root)
+        dtypes = {name: [] for name in EXPORT_COLUMNS}
+        rows = 0
+        stopped = False
+        temp_path = f"{path}.tmp"
+        spool = tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) if fmt == "columnar" else None
+        with spool or nullcontext(), open(temp_path, "wb" if fmt == "columnar" else "w",
+                                          newline="" if fmt == "csv" else None,
+                                          encoding=None if fmt == "columnar" else "utf-8") as file:
+            if fmt == "csv":
+                writer = csv.writer(file)
+                writer.writerow(EXPORT_CSV_HEADER)
+            while chunk := list(islice(records, batch)):
+                if fmt == "csv":
+                    writer.writerows(chunk)
+                elif fmt == "jsonl":
+                    file.writelines(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + "\n" for row in chunk)
+                else:
+                    for name, values in zip(EXPORT_COLUMNS, zip(*chunk)):
+                        values = np.asarray(values)
+                        np.save(os.path.join(spool.name, f"{name}.{len(dtypes[name])}.npy"), values)
+                        dtypes[name].append(values.dtype)
+                rows += len(chunk)
+                if progress is not None:
+                    progress(rows)
+                if stop is not None and stop.is_set():
+                    stopped = True
+                    break
+            else:
+                if fmt == "columnar":
+                    _write_npz_columns(file, spool.name, dtypes, rows)
+        if stopped:
+            os.remove(temp_path)
+            return None
+        os.replace(temp_path, path)
+        return rows
+
+    def get_height(self):
+        """Return the height of the tree (kept on the root node)."""
+        return self._node_height(self.root)
+
+    def depth_of(self, node):
+        """Return a node's depth, refreshing the depth cache first if it was invalidated."""
+        if self._version_depths is not None:
+            depth = self._version_depths.get(node) if self._depths_valid else None
+            if depth is None:  # Invalidated, or a node added since the last refresh
+                self.refresh_depths()
+                depth = self._version_depths[node]
+            return depth
+        if not self._depths_valid:
+            self.refresh_depths()
+        return node.cached_depth
+
+    def refresh_depths(self):
+        """Recompute every node's cached depth in one top-down pass."""
+        depths = self._version_depths
+        if depths is not None:
+            depths.clear()
+        level = [self.root] if self.root is not None else []
+        depth = 0
+        while level:
+            for node in level:
+                if depths is None:
+                    node.cached_depth = depth
+                else:
+                    depths[node] = depth
+            level = [child for n in level for child in (n.left, n.right) if child is not None]
+            depth += 1
+        self._depths_valid = True
 
     def assign_positions(self):
         """Assign x, y coordinates to nodes for visualization."""
-        height = self.get_height()
+        # Capped so coordinates fit in a float; deeper levels just share positions
+        height = min(self.get_height(), 1023)
         max_width = 2 ** (height) - 1
-        self._assign_positions_rec(self.root, 0, max_width, 0, height)
+        self._assign_positions_iter(self.root, 0, max_width)
 
-    def _assign_positions_rec(self, node, left, right, level, height):
-        """Recursive helper to assign positions."""
+    @staticmethod
+    def _assign_positions_iter(node, left, right):
+        """Stack-based helper to assign positions."""
         if node is None:
             return
 
-        # Calculate node position
-        node.x = (left + right) / 2
-        node.y = level
+        stack = [(node, left, right, 0)]
+        while stack:
+            node, left, right, level = stack.pop()
 
-        # Calculate spacing based on level
-        next_level = level + 1
+            # Calculate node position
+            node.x = (left + right) / 2
+            node.y = level
 
-        # Process children
-        if node.left:
-            self._assign_positions_rec(node.left, left, node.x, next_level, height)
-        if node.right:
-            self._assign_positions_rec(node.right, node.x, right, next_level, height)
+            # Process children
+            if node.right:
+                stack.append((node.right, node.x, right, level + 1))
+            if node.left:
+                stack.append((node.left, left, node.x, level + 1))
+
+
+# --- Frozen NumPy Snapshot for Batch Lookups ---
+def _key_array(keys):
+    """Return a sequence of keys as a 1-D array.
+
+    Numbers and strings get a typed array. Keys that NumPy would unpack
+    into extra dimensions, like tuples, are kept whole in an object array,
+    compared with their own < and ==.
+    """
+    try:
+        values = np.asarray(keys)
+    except ValueError:  # Sequences of different lengths
+        values = None
+    if values is None or values.ndim != 1:
+        values = np.empty(len(keys), dtype=object)
+        for i, key in enumerate(keys):
+            values[i] = key
+    return values
+
+
+class FrozenTree:
+    """Read-only snapshot of a tree's keys answering whole batches of lookups with NumPy.
+
+    The keys are kept twice: in sorted order, and in Eytzinger (breadth-first)
+    order, where the node in slot i has its children in slots 2i and 2i + 1.
+    A batch query walks every probe key down the Eytzinger layout at once,
+    one vectorized pass per tree level; the top levels that every probe
+    touches stay in cache.
+
+    Single-key lookups descend either the Eytzinger layout (layout="eytzinger")
+    or a van Emde Boas layout (layout="veb"), which stores each top half of
+    the tree's levels before the bottom subtrees hanging from it, recursively,
+    so a root-to-leaf walk touches few memory blocks at every block size.
+
+    counts, if given, holds how many copies of each key a multiset has;
+    ranks and len() then count every copy, as the tree's own do.
+    """
+
+    def __init__(self, sorted_keys, layout="eytzinger", counts=None):
+        if layout not in STATIC_LAYOUTS:
+            raise ValueError(f"Unknown static layout {layout!r}; expected one of {STATIC_LAYOUTS}")
+        self.layout = layout
+        self.keys = _key_array(sorted_keys)
+        n = len(self.keys)
+        # prefix[r] is the number of copies of the r smallest distinct keys
+        self.counts = np.ones(n, dtype=np.int64) if counts is None else np.array(counts, dtype=np.int64)
+        if len(self.counts) != n:
+            raise ValueError(f"Got {len(self.counts)} counts for {n} keys")
+        self.prefix = np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(self.counts)])
+        self.levels = n.bit_length()
+        slots = 1 << self.levels
+
+        # Slot i (1-based, breadth-first) of the complete tree holds the key of
+        # in-order rank ranks[i - 1]. In a perfect tree of this height the
+        # in-order index of slot i at depth d is (2 * offset + 1) * 2^(levels - 1 - d) - 1;
+        # subtract the unfilled bottom-level slots that come before it.
+        slot = np.arange(1, n + 1, dtype=np.int64)
+        depth = np.frexp(slot.astype(np.float64))[1].astype(np.int64) - 1
+        perfect = (2 * (slot - (1 << depth)) + 1) * (1 << (self.levels - 1 - depth)) - 1
+        bottom_filled = n - ((1 << (self.levels - 1)) - 1) if n else 0
+        ranks = perfect - np.maximum(0, (perfect + 1) // 2 - bottom_filled)
+
+        # Slot 0 and the unfilled bottom slots are padding: the descent never
+        # stops on them, and slot 0 means "past the last key" (rank n)
+        self.eytzinger = np.empty(slots, dtype=self.keys.dtype)
+        if n:
+            self.eytzinger[1:n + 1] = self.keys[ranks]
+            self.eytzinger[:1] = self.eytzinger[n + 1:] = self.keys[-1:]
+        self.slot_rank = np.full(slots, n, dtype=np.int64)
+        self.slot_rank[1:n + 1] = ranks
+        self.slot_rank = self.prefix[self.slot_rank]  # Count the copies of every smaller key
+
+        if layout == "veb":
+            # veb_keys[p] is the key at vEB position p; its children are at
+            # positions veb_children[p] (-1 for none)
+            order = self._veb_slots(self.levels)
+            order = order[order <= n]
+            position = np.full(2 * n + 2, -1, dtype=np.int64)
+            position[order] = np.arange(n, dtype=np.int64)
+            self.veb_keys = self.eytzinger[order]
+            self.veb_children = np.stack([position[2 * order], position[2 * order + 1]], axis=1)
+
+        for values in (self.keys, self.counts, self.prefix, self.eytzinger, self.slot_rank):
+            values.flags.writeable = False
+        self._lookup = None  # Python-list copy of the scalar layout, made on first lookup
+
+    @staticmethod
+    def _veb_slots(levels):
+        """Return the breadth-first slot numbers of a perfect tree with this many levels, in vEB order."""
+        memo = {0: np.zeros(0, dtype=np.int64), 1: np.ones(1, dtype=np.int64)}
+        pending = [levels]
+        while levels not in memo:
+            height = pending[-1]
+            top, bottom = height // 2, height - height // 2
+            missing = [h for h in (top, bottom) if h not in memo]
+            if missing:
+                pending.extend(missing)
+                continue
+            pending.pop()
+            # Top tree first, then each bottom tree left to right; a slot s of a
+            # bottom tree rooted at r is slot (r << depth(s)) + s - 2^depth(s)
+            sub = memo[bottom]
+            depth = np.frexp(sub.astype(np.float64))[1].astype(np.int64) - 1
+            roots = (1 << top) + np.arange(1 << top, dtype=np.int64)
+            blocks = (roots[:, None] << depth[None, :]) + (sub - (1 << depth))[None, :]
+            memo[height] = np.concatenate([memo[top], blocks.ravel()])
+        return memo[levels]
+
+    def __len__(self):
+        """Number of keys in the snapshot (every copy counts in a multiset)."""
+        return int(self.prefix[-1])
+
+    def __contains__(self, key):
+        """Look up a single key with a branch-light descent of the static layout."""
+        if self._lookup is None:
+            if self.layout == "eytzinger":
+                self._lookup = self.eytzinger.tolist()
+            else:
+                self._lookup = (self.veb_keys.tolist(), self.veb_children.ravel().tolist())
+        n = len(self.keys)
+        if self.layout == "eytzinger":
+            keys = self._lookup
+            slot = 1
+            while slot <= n:
+                slot = 2 * slot + (keys[slot] < key)
+            slot //= 2 * (~slot & (slot + 1))
+            return slot > 0 and keys[slot] == key
+        keys, children = self._lookup
+        position = 0 if n else -1
+        while position >= 0:
+            node_key = keys[position]
+            if node_key == key:
+                return True
+            position = children[2 * position + (node_key < key)]
+        return False
+
+    def _probe_array(self, probes):
+        """Return the probe keys as an array, one element per probe when the keys are objects such as tuples."""
+        if self.keys.dtype == object and not isinstance(probes, np.ndarray):
+            return _key_array(list(probes))
+        return np.asarray(probes)
+
+    def _lower_bound_slots(self, probes):
+        """Return, for each probe, the Eytzinger slot of the first key >= it (0 if none)."""
+        n = len(self.keys)
+        slot = np.ones(len(probes), dtype=np.int64)
+        for _ in range(self.levels):
+            # Move right when the key is smaller than the probe (or the slot is padding)
+            slot = 2 * slot + ((self.eytzinger[slot] < probes) | (slot > n))
+        # The answer is the last slot where the walk went left: drop the
+        # trailing right moves (1 bits) and that one left move (0 bit)
+        lowest_zero = ~slot & (slot + 1)
+        return slot // (2 * lowest_zero)
+
+    def contains_many(self, probes):
+        """Return a boolean array telling which probe keys are in the snapshot."""
+        probes = self._probe_array(probes)
+        if not len(self.keys):
+            return np.zeros(probes.shape, dtype=bool)
+        slot = self._lower_bound_slots(probes.ravel())
+        found = (slot > 0) & (self.eytzinger[slot] == probes.ravel())
+        return found.reshape(probes.shape)
+
+    def rank_many(self, probes):
+        """Return, for each probe key, how many snapshot keys are smaller than it."""
+        probes = self._probe_array(probes)
+        if not len(self.keys):
+            return np.zeros(probes.shape, dtype=np.int64)
+        return self.slot_rank[self._lower_bound_slots(probes.ravel())].reshape(probes.shape)
+
+
+# --- Thread-Safe Wrapper: Serialized Writes, Lock-Free Snapshot Reads ---
+class ConcurrentTree:
+    """Shares one tree between writer threads and readers such as the GUI.
+
+    Writers take turns on a persistent BinarySearchTree. Each write builds a
+    new version next to the old ones and then publishes its root with a
+    single reference assignment. Readers call snapshot() and get that
+    version without taking any lock. Nothing ever changes a published
+    version, so a reader can take as long as it likes.
+    """
+
+    def __init__(self, tree=None, **options):
+        """Wrap a persistent tree, or build an empty one from BinarySearchTree options (tracing off by default)."""
+        if tree is None:
+            tree = BinarySearchTree(persistent=True, **{"trace": "off", **options})
+        if not tree.persistent:
+            raise ValueError("ConcurrentTree needs a persistent tree")
+        self._tree = tree
+        self._write_lock = threading.Lock()
+        self._published = tree.root
+        self.version = 0  # Number of versions published so far
+
+    def snapshot(self):
+        """Return the latest published version as a tree (persistent, so writing to it is private)."""
+        return self._tree.at_version(self._published)
+
+    def _publish(self):
+        # Readers keep alive the versions they hold; the writer does not need the history
+        del self._tree.versions[:-1]
+        self._tree.steps = StepTrace()
+        self._published = self._tree.root
+        self.version += 1
+
+    def insert(self, key):
+        with self._write_lock:
+            self._tree.insert(key)
+            self._publish()
+
+    def delete(self, key):
+        """Delete key; returns True if it was present."""
+        with self._write_lock:
+            deleted = self._tree.delete(key)[0]
+            self._publish()
+        return deleted
+
+    def remove_one(self, key):
+        """Remove one copy of key; returns True if there was one."""
+        with self._write_lock:
+            removed = self._tree.remove_one(key)[0]
+            self._publish()
+        return removed
+
+    def update(self, keys):
+        """Insert many keys as one new version under one turn of the lock; returns how many were added."""
+        with self._write_lock:
+            added = self._tree.insert_many(keys)
+            self._publish()
+        return added
+
+    def __contains__(self, key):
+        return key in self.snapshot()
+
+    def __len__(self):
+        return len(self.snapshot())
+
+    def __iter__(self):
+        return iter(self.snapshot())
 
 
 # --- MatplotlibCanvas with Colorization Support ---
 class MatplotlibCanvas(FigureCanvas):
-    """Matplotlib canvas for drawing the tree."""
+    """Matplotlib canvas for drawing the tree.
+
+    Each tree version is drawn once, as one PatchCollection of node
+    circles, one LineCollection of edges and a text label per node.
+    Highlighting then only rewrites the colors of the nodes and edges
+    involved; the artists are rebuilt when the tree version, the color mode
+    or the tree itself (set_tree) changes.
+
+    With blitting on (see set_blitting()) highlights are not drawn into
+    the figure at all: the unhighlighted picture is kept as a background,
+    and a highlight change restores it and draws only the highlighted
+    circles, the edges touching them and their labels on top.
+    """
 
     def __init__(self, parent=None, width=8, height=6, dpi=100):
         self.fig = Figure(figsize=(width, height), dpi=dpi)
@@ -359,12 +2486,38 @@ class MatplotlibCanvas(FigureCanvas):
         self.axes.set_frame_on(False)
 
         self.tree = None
+        self.drawn_tree = None  # The tree (or published version) drawn last
         self.node_colors = {}
         self.edge_colors = {}
         self.highlighted_node = None
         self.highlighted_edge = None
         self.color_mode = "None"  # Default: no colorization
 
+        # Artists of the drawn version and where each node and edge sits in them
+        self._drawn_root = None
+        self._node_artist = None
+        self._edge_artist = None
+        self._node_index = {}
+        self._edge_index = {}
+        self._base_node_rgba = None  # Colors without highlights
+        self._node_rgba = None
+        self._edge_rgba = None
+        self._recolored_nodes = []  # Indices whose color a highlight changed
+        self._recolored_edges = []
+
+        # Blitting: the picture without highlights, and what is drawn over it
+        self.blitting = False
+        self._background = None
+        self._blit_pending = False
+        self._nodes = []
+        self._centers = []
+        self._segments = []
+        self._labels = []
+        self._parent_edge = None  # Per node, the index of the edge from its parent (-1 for the root)
+        self._overlay_nodes = None
+        self._overlay_edges = None
+        self.mpl_connect('draw_event', self._on_draw)
+
     def set_tree(self, tree):
         """Set the tree to visualize."""
         self.tree = tree
@@ -384,23 +2537,71 @@ class MatplotlibCanvas(FigureCanvas):
         self.highlighted_edge = None
 
     def update_figure(self):
-        """Update the figure with the current tree."""
+        """Rebuild the drawing of the current tree from scratch."""
         self.axes.clear()
-
-        if not self.tree or not self.tree.root:
+        self._node_artist = self._edge_artist = None
+        self._overlay_nodes = self._overlay_edges = None
+        self._node_index = {}
+        self._edge_index = {}
+        self._recolored_nodes = []
+        self._recolored_edges = []
+        self._background = None
+
+        # A ConcurrentTree may be written from other threads: draw the version published right now
+        self.drawn_tree = self.tree.snapshot() if isinstance(self.tree, ConcurrentTree) else self.tree
+        self._drawn_root = self.drawn_tree.root if self.drawn_tree else None
+        if not self.drawn_tree or not self.drawn_tree.root:
             self.axes.set_title("Empty Tree")
             self.draw()
             return
 
         # Assign positions for visualization
-        self.tree.assign_positions()
-
-        # Draw the tree
-        self._draw_tree(self.tree.root, None)
+        self.drawn_tree.assign_positions()
+
+        # Collect nodes and edges in pre-order; positions are copied out, since
+        # laying out another version moves the nodes it shares with this one
+        nodes, centers, segments, parent_edge = [], [], [], array('i')
+        stack = [(self.drawn_tree.root, None)]
+        while stack:
+            node, parent = stack.pop()
+            self._node_index[node] = len(nodes)
+            nodes.append(node)
+            centers.append((node.x, -node.y))
+            if parent is not None:
+                self._edge_index[(parent, node)] = len(segments)
+                parent_edge.append(len(segments))
+                segments.append((centers[self._node_index[parent]], centers[-1]))
+            else:
+                parent_edge.append(-1)
+            for child in (node.right, node.left):
+                if child is not None:
+                    stack.append((child, node))
+
+        self._base_node_rgba = self._base_colors(nodes)
+        self._node_rgba = self._base_node_rgba.copy()
+        self._edge_rgba = np.tile(to_rgba('black'), (len(segments), 1))
+        self._node_artist = PatchCollection([Circle(center, 0.3) for center in centers], facecolors=self._node_rgba,
+                                            edgecolors='face', alpha=0.8, zorder=1)
+        self._edge_artist = LineCollection(segments, colors=self._edge_rgba, linewidths=2, zorder=2)
+        self.axes.add_collection(self._node_artist)
+        self.axes.add_collection(self._edge_artist)
+        self._labels = []
+        for node, (x, y) in zip(nodes, centers):
+            label = f"{node.key}×{node.count}" if node.count > 1 else str(node.key)
+            self._labels.append(self.axes.text(x, y, label,
+                                               horizontalalignment='center',
+                                               verticalalignment='center',
+                                               fontsize=10,
+                                               fontweight='bold'))
+        self._nodes, self._centers, self._segments, self._parent_edge = nodes, centers, segments, parent_edge
+        # Animated artists are left out of full draws; _on_draw() draws them when blitting
+        self._overlay_nodes = self.axes.add_collection(PatchCollection([], edgecolors='face', zorder=1, animated=True))
+        self._overlay_edges = self.axes.add_collection(LineCollection([], linewidths=2, zorder=2, animated=True))
+        self._apply_highlights()
 
         # Adjust plot limits based on tree size
-        height = self.tree.get_height()
-        width = 2 ** height
+        height = self.drawn_tree.get_height()
+        width = float(2 ** min(height, 1023))
 
         self.axes.set_xlim([-1, width])
         self.axes.set_ylim([-height, 1])
@@ -408,75 +2609,148 @@ class MatplotlibCanvas(FigureCanvas):
         self.fig.tight_layout()
         self.draw()
 
-    def _draw_tree(self, node, parent=None):
-        """Recursively draw the tree nodes and edges."""
-        if node is None:
+    def _base_colors(self, nodes):
+        """RGBA color of each node under the current color mode, before highlights."""
+        if self.color_mode == "By Depth":
+            # Blue (shallow) to red (deep), from the tree's depth cache
+            max_depth = self.drawn_tree.get_height() - 1
+            if max_depth > 0:
+                depths = np.fromiter((self.drawn_tree.depth_of(node) for node in nodes), dtype=float, count=len(nodes))
+                return plt.get_cmap("coolwarm")(depths / max_depth)
+        elif self.color_mode == "By Subtree Size":
+            max_size = self.drawn_tree.root.size
+            if max_size > 1:
+                sizes = np.fromiter((node.size for node in nodes), dtype=float, count=len(nodes))
+                return plt.get_cmap("YlGnBu")((sizes - 1) / (max_size - 1))
+        elif self.drawn_tree.balance == "red_black":
+            # Show red-black colors so recolorings are visible
+            red, black = to_rgba('lightcoral'), to_rgba('darkgray')
+            return np.array([red if node.red else black for node in nodes])
+        return np.tile(to_rgba('skyblue'), (len(nodes), 1))
+
+    def _apply_highlights(self):
+        """Recolor the nodes and edges whose highlight changed since the last call.
+
+        When blitting, the figure itself keeps the colors without highlights.
+        """
+        for i in self._recolored_nodes:
+            self._node_rgba[i] = self._base_node_rgba[i]
+        for i in self._recolored_edges:
+            self._edge_rgba[i] = to_rgba('black')
+        if self.blitting:
+            self._recolored_nodes = self._recolored_edges = []
+            self._node_artist.set_facecolor(self._node_rgba)
+            self._edge_artist.set_color(self._edge_rgba)
             return
+        self._recolored_nodes = [self._node_index[node] for node in self.node_colors if node in self._node_index]
+        self._recolored_edges = [self._edge_index[edge] for edge in self.edge_colors if edge in self._edge_index]
+        for node, color in self.node_colors.items():
+            if node in self._node_index:
+                self._node_rgba[self._node_index[node]] = to_rgba(color)
+        for edge, color in self.edge_colors.items():
+            if edge in self._edge_index:
+                self._edge_rgba[self._edge_index[edge]] = to_rgba(color)
+        self._node_artist.set_facecolor(self._node_rgba)
+        self._edge_artist.set_color(self._edge_rgba)
+
+    def _refresh(self):
+        """Show the current highlights, rebuilding the drawing only if the tree's version changed."""
+        tree = self.tree.snapshot() if isinstance(self.tree, ConcurrentTree) else self.tree
+        if self._node_artist is None or tree is None or tree.root is not self._drawn_root:
+            self.update_figure()
+        elif self.blitting:
+            # Every highlight change of one step is shown by a single blit
+            if not self._blit_pending:
+                self._blit_pending = True
+                QTimer.singleShot(0, self, self._blit_highlights)
+        else:
+            self._apply_highlights()
+            self.draw_idle()
 
-        # Node colorization logic
-        node_id = id(node)
-        color = self.node_colors.get(node_id)
-        if not color:
-            if self.color_mode == "By Depth":
-                # Use depth from root to colorize
-                depth = node.depth(self.tree.root)
-                # Blue (shallow) to red (deep)
-                max_depth = self.tree.get_height() - 1
-                if max_depth <= 0:
-                    color = 'skyblue'
-                else:
-                    cmap = plt.get_cmap("coolwarm")
-                    color = cmap(depth / max_depth) if max_depth > 0 else 'skyblue'
-            elif self.color_mode == "By Subtree Size":
-                size = node.count_subtree_nodes()
-                max_size = self.tree.root.count_subtree_nodes() if self.tree.root else 1
-                cmap = plt.get_cmap("YlGnBu")
-                color = cmap((size - 1) / (max_size - 1)) if max_size > 1 else 'skyblue'
-            else:
-                color = 'skyblue'
-
-        # Draw node
-        circle = plt.Circle((node.x, -node.y), 0.3, color=color, alpha=0.8)
-        self.axes.add_patch(circle)
-
-        # Add node label
-        self.axes.text(node.x, -node.y, str(node.key),
-                       horizontalalignment='center',
-                       verticalalignment='center',
-                       fontsize=10,
-                       fontweight='bold')
-
-        # Draw edge from parent if exists
-        if parent:
-            edge_key = (id(parent), id(node))
-            edge_color = self.edge_colors.get(edge_key, 'black')
-            self.axes.plot([parent.x, node.x], [-parent.y, -node.y],
-                           color=edge_color, linewidth=2)
-
-        # Draw children
-        self._draw_tree(node.left, node)
-        self._draw_tree(node.right, node)
+    def set_blitting(self, enabled):
+        """Turn blitted highlighting (for animation playback) on or off.
+
+        Blitting redraws only the highlighted artists over a cached
+        background, so a step costs the same on a tree of any size. It is
+        meant for playback: a figure saved while it is on has no highlights.
+        """
+        enabled = bool(enabled) and self.supports_blit
+        if enabled == self.blitting:
+            return
+        self.blitting = enabled
+        if self._node_artist is not None:
+            self._apply_highlights()
+        self.draw()
+
+    def _on_draw(self, event):
+        """After a full draw, keep the picture as the blitting background and draw the highlights over it."""
+        if not self.blitting:
+            return
+        self._background = self.copy_from_bbox(self.fig.bbox)
+        self._draw_overlay()
+
+    def _blit_highlights(self):
+        """Restore the background, draw the current highlights over it and repaint."""
+        self._blit_pending = False
+        if not self.blitting:
+            return
+        if self._background is None:
+            self.draw()  # _on_draw() takes the background and draws the highlights
+            return
+        self.restore_region(self._background)
+        self._draw_overlay()
+        self.blit(self.fig.bbox)
+
+    def _draw_overlay(self):
+        """Draw the highlighted nodes, the edges touching them and their labels with draw_artist()."""
+        if self._overlay_nodes is None:
+            return
+        nodes = [self._node_index[node] for node in self.node_colors if node in self._node_index]
+        edge_rgba = {self._edge_index[edge]: to_rgba(color) for edge, color in self.edge_colors.items()
+                     if edge in self._edge_index}
+        # Edges run into the circles' centers, so those of a highlighted node are drawn again over it
+        edges = set(edge_rgba)
+        for i in nodes:
+            node = self._nodes[i]
+            if self._parent_edge[i] >= 0:
+                edges.add(self._parent_edge[i])
+            for child in (node.left, node.right):
+                if (node, child) in self._edge_index:
+                    edges.add(self._edge_index[(node, child)])
+        edges = sorted(edges)
+
+        # Opaque colors that look like the figure's alpha 0.8 circles on the figure background
+        face = np.array([to_rgba(self.node_colors[self._nodes[i]]) for i in nodes]).reshape(-1, 4)
+        face[:, :3] = 0.8 * face[:, :3] + 0.2 * np.asarray(to_rgba(self.fig.get_facecolor()))[:3]
+        face[:, 3] = 1
+        self._overlay_nodes.set_paths([Circle(self._centers[i], 0.3) for i in nodes])
+        self._overlay_nodes.set_facecolor(face)
+        self._overlay_edges.set_segments([self._segments[i] for i in edges])
+        self._overlay_edges.set_color([edge_rgba.get(i, to_rgba('black')) for i in edges])
+        self.axes.draw_artist(self._overlay_nodes)
+        self.axes.draw_artist(self._overlay_edges)
+        for i in nodes:
+            self.axes.draw_artist(self._labels[i])
 
     def highlight_node(self, node, color='yellow'):
         """Highlight a specific node."""
         if node:
-            node_id = id(node)
-            self.node_colors[node_id] = color
-            self.highlighted_node = node_id
-            self.update_figure()
+            self.node_colors[node] = color
+            self.highlighted_node = node
+            self._refresh()
 
     def highlight_edge(self, parent, child, color='red'):
         """Highlight a specific edge."""
         if parent and child:
-            edge = (id(parent), id(child))
+            edge = (parent, child)
             self.edge_colors[edge] = color
             self.highlighted_edge = edge
-            self.update_figure()
+            self._refresh()
 
     def reset_highlights(self):
         """Reset all highlights."""
         self.reset_colors()
-        self.update_figure()
+        self._refresh()
 
 
 class BSTVisualizer(QMainWindow):
@@ -490,7 +2764,9 @@ class BSTVisualizer(QMainWindow):
         self.setMinimumSize(800, 600)
 
         # Create the binary search tree
-        self.bst = BinarySearchTree()
+        self.balance_policy = "none"
+        self.multiset = False
+        self.bst = BinarySearchTree(balance=self.balance_policy, persistent=True, multiset=self.multiset, trace="off")
 
         # Predefine all UI attributes to None
         self.canvas = None
@@ -498,8 +2774,13 @@ class BSTVisualizer(QMainWindow):
         self.insert_button = None
         self.search_input = None
         self.search_button = None
+        self.delete_input = None
+        self.delete_button = None
         self.traversal_combo = None
         self.traversal_button = None
+        self.range_low_input = None
+        self.range_high_input = None
+        self.range_button = None
         self.speed_slider = None
         self.prev_button = None
         self.play_button = None
@@ -510,6 +2791,8 @@ class BSTVisualizer(QMainWindow):
         self.sample_button = None
         self.reset_button = None
         self.color_mode_combo = None
+        self.balance_combo = None
+        self.multiset_checkbox = None
         self.insights_groupbox = None
         self.insight_toggle_checkbox = None
         self.view_graph_button = None
@@ -529,8 +2812,7 @@ class BSTVisualizer(QMainWindow):
         self.animation_speed = 1000  # ms
         self.animation_timer = QTimer()
         self.animation_timer.timeout.connect(self.animation_step)
-        self.current_step_index = 0
-        self.current_steps = []
+        self.current_steps = StepStream()
         self.is_animating = False
 
     def setup_ui(self):
@@ -668,6 +2950,23 @@ class BSTVisualizer(QMainWindow):
         color_mode_layout.addStretch()
         right_panel_layout.addLayout(color_mode_layout)
 
+        # --- Balancing policy selection ---
+        balance_layout = QHBoxLayout()
+        balance_label = QLabel("Balancing:")
+        self.balance_combo = QComboBox()
+        self.balance_combo.addItems(["None", "AVL", "Red-Black"])
+        self.balance_combo.setMinimumWidth(140)
+        self.balance_combo.currentTextChanged.connect(self.on_balance_changed)
+        balance_layout.addWidget(balance_label)
+        balance_layout.addWidget(self.balance_combo)
+        balance_layout.addStretch()
+        right_panel_layout.addLayout(balance_layout)
+
+        # --- Duplicate handling ---
+        self.multiset_checkbox = QCheckBox("Count duplicate values (multiset)")
+        self.multiset_checkbox.toggled.connect(self.on_multiset_toggled)
+        right_panel_layout.addWidget(self.multiset_checkbox, alignment=Qt.AlignLeft)
+
         # --- Operations Group ---
         operations_group = QGroupBox("Tree Operations")
         operations_layout = QVBoxLayout()
@@ -676,8 +2975,8 @@ class BSTVisualizer(QMainWindow):
         lbl_insert = QLabel("Insert Value:")
         lbl_insert.setMinimumWidth(90)
         insert_layout.addWidget(lbl_insert)
-        self.insert_input = QSpinBox()
-        self.insert_input.setRange(1, 999)
+        self.insert_input = QLineEdit("0")
+        self.insert_input.setPlaceholderText(KEY_INPUT_HINT)
         self.insert_input.setMinimumWidth(80)
         insert_layout.addWidget(self.insert_input)
         self.insert_button = QPushButton("Insert")
@@ -690,8 +2989,8 @@ class BSTVisualizer(QMainWindow):
         lbl_search = QLabel("Search Value:")
         lbl_search.setMinimumWidth(90)
         search_layout.addWidget(lbl_search)
-        self.search_input = QSpinBox()
-        self.search_input.setRange(1, 999)
+        self.search_input = QLineEdit("0")
+        self.search_input.setPlaceholderText(KEY_INPUT_HINT)
         self.search_input.setMinimumWidth(80)
         search_layout.addWidget(self.search_input)
         self.search_button = QPushButton("Search")
@@ -699,13 +2998,27 @@ class BSTVisualizer(QMainWindow):
         self.search_button.clicked.connect(self.on_search)
         search_layout.addWidget(self.search_button)
         operations_layout.addLayout(search_layout)
+        # Delete controls
+        delete_layout = QHBoxLayout()
+        lbl_delete = QLabel("Delete Value:")
+        lbl_delete.setMinimumWidth(90)
+        delete_layout.addWidget(lbl_delete)
+        self.delete_input = QLineEdit("0")
+        self.delete_input.setPlaceholderText(KEY_INPUT_HINT)
+        self.delete_input.setMinimumWidth(80)
+        delete_layout.addWidget(self.delete_input)
+        self.delete_button = QPushButton("Delete")
+        self.delete_button.setMinimumWidth(80)
+        self.delete_button.clicked.connect(self.on_delete)
+        delete_layout.addWidget(self.delete_button)
+        operations_layout.addLayout(delete_layout)
         # Traversal controls
         traversal_layout = QHBoxLayout()
         lbl_traversal = QLabel("Traversal:")
         lbl_traversal.setMinimumWidth(90)
         traversal_layout.addWidget(lbl_traversal)
         self.traversal_combo = QComboBox()
-        self.traversal_combo.addItems(["In-Order"])
+        self.traversal_combo.addItems(list(TRAVERSAL_ORDERS.values()))
         self.traversal_combo.setMinimumWidth(120)
         traversal_layout.addWidget(self.traversal_combo)
         self.traversal_button = QPushButton("Traverse")
@@ -713,6 +3026,22 @@ class BSTVisualizer(QMainWindow):
         self.traversal_button.clicked.connect(self.on_traverse)
         traversal_layout.addWidget(self.traversal_button)
         operations_layout.addLayout(traversal_layout)
+        # Range query controls
+        range_layout = QHBoxLayout()
+        lbl_range = QLabel("Range:")
+        lbl_range.setMinimumWidth(90)
+        range_layout.addWidget(lbl_range)
+        self.range_low_input = QLineEdit("0")
+        self.range_low_input.setMinimumWidth(60)
+        range_layout.addWidget(self.range_low_input)
+        self.range_high_input = QLineEdit("999")
+        self.range_high_input.setMinimumWidth(60)
+        range_layout.addWidget(self.range_high_input)
+        self.range_button = QPushButton("Find Range")
+        self.range_button.setMinimumWidth(80)
+        self.range_button.clicked.connect(self.on_range)
+        range_layout.addWidget(self.range_button)
+        operations_layout.addLayout(range_layout)
         operations_group.setLayout(operations_layout)
         right_panel_layout.addWidget(operations_group)
 
@@ -775,6 +3104,10 @@ class BSTVisualizer(QMainWindow):
         self.sample_button.clicked.connect(self.load_sample_tree)
         self.sample_button.setMinimumWidth(120)
         right_panel_layout.addWidget(self.sample_button)
+        self.import_button = QPushButton("Import Keys...")
+        self.import_button.clicked.connect(self.import_keys)
+        self.import_button.setMinimumWidth(120)
+        right_panel_layout.addWidget(self.import_button)
         self.reset_button = QPushButton("Reset Tree")
         self.reset_button.clicked.connect(self.reset_tree)
         self.reset_button.setMinimumWidth(120)
@@ -817,16 +3150,11 @@ class BSTVisualizer(QMainWindow):
             return
 
         graph = nx.DiGraph()
-
-        def add_edges(node):
+        for node in self.bst.iter_nodes("preorder"):
             if node.left:
                 graph.add_edge(node.key, node.left.key)
-                add_edges(node.left)
             if node.right:
                 graph.add_edge(node.key, node.right.key)
-                add_edges(node.right)
-
-        add_edges(self.bst.root)
 
         try:
             pos = nx.nx_pydot.graphviz_layout(graph, prog="dot")
@@ -884,6 +3212,29 @@ class BSTVisualizer(QMainWindow):
         """Handle color mode change."""
         self.canvas.set_color_mode(mode)
 
+    def on_balance_changed(self, label):
+        """Rebuild the current tree under the newly selected balancing policy."""
+        self.balance_policy = {"None": "none", "AVL": "avl", "Red-Black": "red_black"}[label]
+        self.rebuild_tree(f"Balancing policy set to {label}")
+
+    def on_multiset_toggled(self, checked):
+        """Rebuild the current tree with or without duplicate counting."""
+        self.multiset = checked
+        self.rebuild_tree("Duplicate values are now " + ("counted" if checked else "ignored"))
+
+    def rebuild_tree(self, message):
+        """Rebuild the tree from its keys under the current balancing and duplicate settings."""
+        self.bst = BinarySearchTree.from_sorted(self.bst, balance=self.balance_policy, persistent=True,
+                                                multiset=self.multiset, trace="off")
+        self.current_steps = StepStream()
+        self.prev_button.setEnabled(False)
+        self.next_button.setEnabled(False)
+        self.play_button.setEnabled(False)
+        self.canvas.set_tree(self.bst)
+        self.log(message)
+        self.update_insights()
+        self.check_balance_and_warn()
+
     def update_animation_speed(self):
         """Update the animation speed based on slider value."""
         speed_value = self.anim_speed_spin.value()
@@ -905,203 +3256,408 @@ class BSTVisualizer(QMainWindow):
     \"\"\"Insert a new key into the binary search tree.\"\"\"
     if self.root is None:  # Check if tree is empty
         self.root = TreeNode(key)  # Make this the root node
-    else:
-        # Tree has nodes, find correct position
-        self._insert_rec(self.root, key)
-
-def _insert_rec(self, node, key):
-    \"\"\"Helper method to insert recursively.\"\"\"
-    if key < node.key:  # New value is smaller
-        if node.left is None:  # No left child
-            node.left = TreeNode(key)  # Create as left child
-        else:
-            # Left child exists, recurse down left
-            self._insert_rec(node.left, key)
-    elif key > node.key:  # New value is larger
-        if node.right is None:  # No right child
-            node.right = TreeNode(key)  # Create as right child
+        return
+
+    node = self.root  # Walk down from the root
+    while True:
+        if key < node.key:  # New value is smaller
+            if node.left is None:  # No left child
+                node.left = TreeNode(key)  # Create as left child
+                return
+            node = node.left  # Left child exists, move down left
+        elif key > node.key:  # New value is larger
+            if node.right is None:  # No right child
+                node.right = TreeNode(key)  # Create as right child
+                return
+            node = node.right  # Right child exists, move down right
         else:
-            # Right child exists, recurse down right
-            self._insert_rec(node.right, key)
-    # Duplicates are not inserted (implicit)""")
+            return  # Duplicates are not inserted""")
         elif operation == "search":
             self.code_text.setPlainText("""def search(self, key):
     \"\"\"Search for a key in the tree\"\"\"
-    return self._search_rec(self.root, key)
-
-def _search_rec(self, node, key):
-    \"\"\"Helper method to search recursively\"\"\"
-    if node is None:  # Reached empty spot - not found
-        return False
-
-    if key == node.key:  # Found exact match
-        return True
-
-    elif key < node.key:  # Target is smaller
-        # Search left subtree
-        return self._search_rec(node.left, key)
-    else:  # key > node.key - target is larger
-        # Search right subtree
-        return self._search_rec(node.right, key)""")
+    node = self.root  # Start at the root
+    while node is not None:  # Empty spot means not found
+        if key == node.key:  # Found exact match
+            return True
+        elif key < node.key:  # Target is smaller
+            node = node.left  # Search left subtree
+        else:  # key > node.key - target is larger
+            node = node.right  # Search right subtree
+    return False""")
+        elif operation == "delete":
+            self.code_text.setPlainText("""def delete(self, key):
+    \"\"\"Delete a key from the tree\"\"\"
+    parent, node = None, self.root
+    while node is not None and key != node.key:  # Find the node
+        parent = node
+        node = node.left if key < node.key else node.right
+    if node is None:
+        return False  # Key is not in the tree
+
+    if node.left and node.right:  # Two children
+        # The successor (leftmost node on the right) takes its place
+        successor_parent, successor = node, node.right
+        while successor.left:
+            successor_parent, successor = successor, successor.left
+        if successor_parent is not node:
+            successor_parent.left = successor.right  # Unhook it
+            successor.right = node.right
+        successor.left = node.left
+        child = successor
+    else:  # At most one child: it moves up
+        child = node.left if node.left else node.right
+
+    if parent is None:
+        self.root = child
+    elif parent.left is node:
+        parent.left = child
+    else:
+        parent.right = child
+    return True""")
         elif operation == "traversal":
             self.code_text.setPlainText("""def inorder_traversal(self):
-    \"\"\"Public method for in-order traversal\"\"\"
-    return self._inorder_traversal_rec(self.root)
-
-def _inorder_traversal_rec(self, node):
-    \"\"\"Private recursive helper for traversal\"\"\"
-    if node is None:
-        return []
-
+    \"\"\"In-order traversal (Left -> Root -> Right)\"\"\"
     result = []
-    # Left subtree first
-    result.extend(self._inorder_traversal_rec(node.left))
-    # Then current node
-    result.append(node.key)
-    # Then right subtree
-    result.extend(self._inorder_traversal_rec(node.right))
+    stack = []  # Nodes waiting to be visited
+    node = self.root
+    while stack or node is not None:
+        # Left subtree first: go as far left as possible
+        while node is not None:
+            stack.append(node)
+            node = node.left
+        # Then current node
+        node = stack.pop()
+        result.append(node.key)
+        # Then right subtree
+        node = node.right
     return result""")
+        elif operation == "range":
+            self.code_text.setPlainText("""def range(self, lo, hi):
+    \"\"\"Yield keys with lo <= key <= hi in sorted order\"\"\"
+    stack = []
+    node = self.root
+    while node is not None:  # One walk down to where the range starts
+        if node.key < lo:
+            node = node.right  # Too small: skip it and its left subtree
+        else:
+            stack.append(node)  # Still to be visited
+            node = node.left
+    while stack:  # Continue in-order from there
+        node = stack.pop()
+        if node.key > hi:
+            return  # Past the range: stop early
+        yield node.key
+        node = node.right
+        while node is not None:
+            stack.append(node)
+            node = node.left""")
+        elif operation == "preorder":
+            self.code_text.setPlainText("""def preorder_traversal(self):
+    \"\"\"Pre-order traversal (Root -> Left -> Right)\"\"\"
+    stack = [self.root] if self.root else []
+    while stack:
+        node = stack.pop()
+        yield node.key  # Current node first
+        if node.right:  # Pushed first, so popped last
+            stack.append(node.right)
+        if node.left:
+            stack.append(node.left)""")
+        elif operation == "postorder":
+            self.code_text.setPlainText("""def postorder_traversal(self):
+    \"\"\"Post-order traversal (Left -> Right -> Root)\"\"\"
+    stack = []
+    node, last = self.root, None
+    while stack or node is not None:
+        while node is not None:  # Go as far left as possible
+            stack.append(node)
+            node = node.left
+        top = stack[-1]
+        if top.right and top.right is not last:
+            node = top.right  # Right subtree not done yet
+        else:
+            last = stack.pop()
+            yield last.key  # Both subtrees done: visit""")
+        elif operation == "levelorder":
+            self.code_text.setPlainText("""def levelorder_traversal(self):
+    \"\"\"Level-order traversal (top to bottom)\"\"\"
+    queue = deque([self.root] if self.root else [])
+    while queue:
+        node = queue.popleft()  # Oldest node first
+        yield node.key
+        if node.left:
+            queue.append(node.left)
+        if node.right:
+            queue.append(node.right)""")
+
+    def _read_key(self, line_edit):
+        """Return the key typed into line_edit, or None (after showing a warning) when there is no usable key."""
+        text = line_edit.text().strip()
+        if not text:
+            QMessageBox.warning(self, "Invalid Input", "Please enter a value.")
+            return None
+        try:
+            key = _parse_key_text(text)
+        except ValueError as error:
+            QMessageBox.warning(self, "Invalid Input", str(error))
+            return None
+        if self.bst.root is not None:
+            try:
+                key < self.bst.root.key  # Every key must be comparable with the others
+            except TypeError:
+                kind = type(self.bst.root.key).__name__
+                QMessageBox.warning(self, "Invalid Input", f"This tree holds {kind} keys. Please enter one of those.")
+                return None
+        return key
 
     def on_insert(self):
         """Handle insert button click."""
-        value = self.insert_input.value()
+        value = self._read_key(self.insert_input)
+        if value is None:
+            return
         self.log(f"Inserting value: {value}")
-        self.current_steps = self.bst.insert(value)
+        with self.bst.tracing("full"):
+            steps = self.bst.insert(value)
         self.update_code_view("insert")
-        self.current_step_index = 0
-        self.prev_button.setEnabled(False)
-        self.next_button.setEnabled(len(self.current_steps) > 0)
-        self.play_button.setEnabled(len(self.current_steps) > 0)
         self.canvas.set_tree(self.bst)
-        if self.current_steps:
-            self.show_step(0)
+        self.play_steps(steps)
+        self.update_insights()
+        self.check_balance_and_warn()
+
+    def on_delete(self):
+        """Handle delete button click."""
+        value = self._read_key(self.delete_input)
+        if value is None:
+            return
+        self.log(f"Deleting value: {value}")
+        with self.bst.tracing("full"):
+            deleted, steps = self.bst.delete(value)
+        self.update_code_view("delete")
+        self.canvas.set_tree(self.bst)
+        self.play_steps(steps)
         self.update_insights()
         self.check_balance_and_warn()
 
     def on_search(self):
         """Handle search button click."""
-        value = self.search_input.value()
+        value = self._read_key(self.search_input)
+        if value is None:
+            return
         self.log(f"Searching for value: {value}")
-        found, steps = self.bst.search(value)
-        self.current_steps = steps
+        with self.bst.tracing("full"):
+            found, steps = self.bst.search(value)
         self.update_code_view("search")
-        self.current_step_index = 0
-        self.prev_button.setEnabled(False)
-        self.next_button.setEnabled(len(self.current_steps) > 0)
-        self.play_button.setEnabled(len(self.current_steps) > 0)
-        if self.current_steps:
-            self.show_step(0)
+        self.play_steps(steps)
         self.update_insights()
         self.check_balance_and_warn()
 
     def on_traverse(self):
         """Handle traverse button click."""
-        self.log("Starting in-order traversal")
-        result, steps = self.bst.inorder_traversal()
-        self.current_steps = steps
-        self.update_code_view("traversal")
-        self.current_step_index = 0
-        self.prev_button.setEnabled(False)
-        self.next_button.setEnabled(len(self.current_steps) > 0)
-        self.play_button.setEnabled(len(self.current_steps) > 0)
-        if self.current_steps:
-            self.show_step(0)
+        label = self.traversal_combo.currentText()
+        order = next(order for order, text in TRAVERSAL_ORDERS.items() if text == label)
+        self.log(f"Starting {label.lower()} traversal")
+        self.update_code_view("traversal" if order == "inorder" else order)
+        # Streamed: playback starts at once however large the tree is
+        self.play_steps(self.bst.traversal_steps(order))
         self.update_insights()
         self.check_balance_and_warn()
 
-    def show_step(self, step_index):
-        """Show a specific step in the animation sequence."""
-        if not self.current_steps or step_index < 0 or step_index >= len(self.current_steps):
+    def on_range(self):
+        """Handle range query button click."""
+        lo = self._read_key(self.range_low_input)
+        hi = self._read_key(self.range_high_input) if lo is not None else None
+        if hi is None:
             return
-
-        step = self.current_steps[step_index]
+        self.log(f"Finding keys between {lo} and {hi}")
+        result = list(self.bst.range(lo, hi, record=True))
+        self.log(f"Keys in range: {result}")
+        self.update_code_view("range")
+        self.play_steps(self.bst.steps)
+
+    def play_steps(self, steps):
+        """Make an operation's steps (a StepTrace, list or step generator) current and show the first."""
+        self.current_steps = StepStream(steps)
+        step = self.current_steps.next()
+        self.prev_button.setEnabled(False)
+        self.next_button.setEnabled(self.current_steps.has_next())
+        self.play_button.setEnabled(self.current_steps.has_next())
+        if step is not None:
+            self.show_step(step)
+
+    def show_step(self, step):
+        """Show a step of the current animation sequence."""
+        # Draw the tree version the step was recorded against (steps of read-only operations use the live tree)
+        self.canvas.tree = self.bst.at_version(step['root']) if 'root' in step else self.bst
         self.canvas.reset_highlights()
         self.explanation_text.setHtml(self.get_explanation_for_step(step))
         self.highlight_for_step(step)
-        self.prev_button.setEnabled(step_index > 0)
-        self.next_button.setEnabled(step_index < len(self.current_steps) - 1)
+        self.prev_button.setEnabled(self.current_steps.has_previous())
+        self.next_button.setEnabled(self.current_steps.has_next())
         if 'message' in step:
             self.log(step['message'])
 
     def prev_step(self):
         """Step backward through the animation."""
-        if self.current_step_index > 0:
-            self.current_step_index -= 1
-            self.show_step(self.current_step_index)
+        step = self.current_steps.previous()
+        if step is not None:
+            self.show_step(step)
 
     def next_step(self):
         """Step forward through the animation."""
-        if self.current_step_index < len(self.current_steps) - 1:
-            self.current_step_index += 1
-            self.show_step(self.current_step_index)
+        step = self.current_steps.next()
+        if step is not None:
+            self.show_step(step)
 
     def toggle_animation(self):
         """Toggle play/pause for animation."""
         if self.is_animating:
-            self.animation_timer.stop()
-            self.is_animating = False
-            self.play_button.setText("Play")
+            self.stop_animation()
         else:
-            if self.current_steps and self.current_step_index < len(self.current_steps) - 1:
+            if self.current_steps.has_next():
+                # Playback only repaints the highlighted nodes each tick
+                self.canvas.set_blitting(True)
                 self.animation_timer.start(self.animation_speed)
                 self.is_animating = True
                 self.play_button.setText("Pause")
 
+    def stop_animation(self):
+        """Stop automatic stepping and go back to drawing highlights into the figure."""
+        self.animation_timer.stop()
+        self.is_animating = False
+        self.play_button.setText("Play")
+        self.canvas.set_blitting(False)
+
     def animation_step(self):
-        """Handle automatic animation stepping."""
-        if self.current_step_index < len(self.current_steps) - 1:
-            self.current_step_index += 1
-            self.show_step(self.current_step_index)
+        """Handle automatic animation stepping: pull the next step from the stream."""
+        step = self.current_steps.next()
+        if step is not None:
+            self.show_step(step)
         else:
-            self.animation_timer.stop()
-            self.is_animating = False
-            self.play_button.setText("Play")
+            self.stop_animation()
 
     def highlight_for_step(self, step):
         """Highlight nodes/edges based on the current step."""
         action = step.get('action', '')
 
-        if action in ['visit', 'visit_inorder']:
+        if action in ['visit', 'visit_inorder', 'visit_preorder', 'visit_postorder', 'visit_levelorder',
+                      'visit_successor']:
             node = step.get('node')
             if node:
                 self.canvas.highlight_node(node, 'yellow')
-        elif action == 'found':
+        elif action in ['found', 'visit_range', 'query_result', 'successor_found']:
             node = step.get('node')
             if node:
                 self.canvas.highlight_node(node, 'lightgreen')
-        elif action == 'insert':
+        elif action in ['insert', 'splice', 'remove', 'increment', 'decrement']:
             node = step.get('node')
             if node:
                 self.canvas.highlight_node(node, 'lightblue')
+        elif action in ['rotate_left', 'rotate_right']:
+            node = step.get('node')
+            pivot = step.get('pivot')
+            if node and pivot:
+                self.canvas.highlight_node(node, 'orange')
+                self.canvas.highlight_node(pivot, 'gold')
+                self.canvas.highlight_edge(pivot, node, 'orange')
+        elif action == 'recolor':
+            node = step.get('node')
+            if node:
+                self.canvas.highlight_node(node, 'red' if step.get('red') else 'dimgray')
 
     def load_sample_tree(self):
         """Load a sample tree for demonstration."""
-        self.bst = BinarySearchTree()
         sample_values = [50, 30, 70, 20, 40, 60, 80, 10, 25, 35, 45, 55, 65, 75, 85]
-
-        for value in sample_values:
-            self.bst.insert(value)
+        self.bst = BinarySearchTree.from_iterable(sample_values, balance=self.balance_policy, persistent=True,
+                                                  multiset=self.multiset, trace="off")
 
         self.canvas.set_tree(self.bst)
         self.log("Sample tree loaded with values: " + ", ".join(map(str, sample_values)))
         self.update_insights()
         self.check_balance_and_warn()
 
+    def import_keys(self):
+        """Insert the keys of a text, CSV or binary file chunk by chunk, with progress and cancellation.
+
+        One chunk is read and inserted per timer tick, so Qt handles events
+        in between and only that chunk is in memory. Chunks go through
+        insert_many(), which records no steps. The versions each chunk
+        leaves behind are dropped, so their path copies do not pile up,
+        and the canvas is redrawn once, when the import ends.
+        """
+        path, chosen_filter = QFileDialog.getOpenFileName(self, "Import Keys", "",
+                                                          ";;".join(IMPORT_FORMATS.values()))
+        if not path:
+            return
+        fmt = next((name for name, label in IMPORT_FORMATS.items() if label == chosen_filter), "text")
+        chunks = read_key_chunks(path, fmt)
+        total_bytes = max(os.path.getsize(path), 1)
+        added = 0
+
+        # Playback of an earlier operation would hold on to the versions dropped below
+        if self.is_animating:
+            self.stop_animation()
+        self.current_steps = StepStream()
+        self.prev_button.setEnabled(False)
+        self.next_button.setEnabled(False)
+        self.play_button.setEnabled(False)
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Import Keys")
+        dialog.setModal(True)
+        layout = QVBoxLayout(dialog)
+        status_label = QLabel(f"Reading {path}...")
+        layout.addWidget(status_label)
+        progress_bar = QProgressBar()
+        progress_bar.setRange(0, 1000)  # Per mille of the file, which may be larger than an int
+        layout.addWidget(progress_bar)
+        cancel_button = QPushButton("Cancel")
+        layout.addWidget(cancel_button)
+
+        def finish(message):
+            timer.stop()
+            chunks.close()
+            status_label.setText(message)
+            cancel_button.setText("Close")
+            cancel_button.clicked.disconnect()
+            cancel_button.clicked.connect(dialog.accept)
+            self.canvas.set_tree(self.bst)
+            self.log(message)
+            self.update_insights()
+            self.check_balance_and_warn()
+
+        def import_chunk():
+            nonlocal added
+            try:
+                keys, bytes_read = next(chunks)
+            except StopIteration:
+                finish(f"Imported {added} keys from {path}")
+                return
+            except (OSError, ValueError) as error:
+                finish(f"Import stopped after {added} keys: {error}")
+                return
+            added += self.bst.insert_many(keys)
+            del self.bst.versions[:-1]  # Nothing can step back into the import
+            progress_bar.setValue(bytes_read * 1000 // total_bytes)
+            status_label.setText(f"Inserted {added} keys...")
+
+        timer = QTimer(dialog)
+        timer.timeout.connect(import_chunk)
+        cancel_button.clicked.connect(lambda: finish(f"Import cancelled after {added} keys (they stay in the tree)"))
+        dialog.rejected.connect(lambda: timer.isActive() and finish(f"Import cancelled after {added} keys"))
+        timer.start(0)
+        dialog.show()
+
     def reset_tree(self):
         """Reset the tree to empty state."""
-        self.bst = BinarySearchTree()
+        self.bst = BinarySearchTree(balance=self.balance_policy, persistent=True, multiset=self.multiset, trace="off")
         self.canvas.set_tree(self.bst)
-        self.current_steps = []
-        self.current_step_index = 0
+        self.current_steps = StepStream()
 
         self.prev_button.setEnabled(False)
         self.next_button.setEnabled(False)
         self.play_button.setEnabled(False)
 
         if self.is_animating:
-            self.animation_timer.stop()
-            self.is_animating = False
-            self.play_button.setText("Play")
+            self.stop_animation()
 
         self.explanation_text.setHtml("""
         <h3>Tree Reset</h3>
@@ -1123,18 +3679,6 @@ def _inorder_traversal_rec(self, node):
             self.insight_text.setPlainText("Tree is empty - no insights available.")
             return
 
-        def count_nodes(node):
-            if not node:
-                return 0
-            return 1 + count_nodes(node.left) + count_nodes(node.right)
-
-        def count_leaves(node):
-            if not node:
-                return 0
-            if not node.left and not node.right:
-                return 1
-            return count_leaves(node.left) + count_leaves(node.right)
-
         def find_min_max(node):
             if not node:
                 return None, None
@@ -1149,17 +3693,21 @@ def _inorder_traversal_rec(self, node):
 
             return min_node.key, max_node.key
 
-        total_nodes = count_nodes(self.bst.root)
-        total_leaves = count_leaves(self.bst.root)
+        total_nodes = self.bst.node_count()
+        total_leaves = sum(1 for node in self.bst.iter_nodes() if not node.left and not node.right)
         height = self.bst.get_height()
         min_val, max_val = find_min_max(self.bst.root)
-        traversal_result = self.bst.inorder_traversal()[0] if self.bst.root else []
+        # Only the first keys are shown, so only those are taken from the traversal
+        preview = list(islice(self.bst.iter_inorder(), 21))
+        traversal_result = ", ".join(map(str, preview[:20])) + (", ..." if len(preview) > 20 else "")
+        is_sorted = all(a < b for a, b in pairwise(self.bst.iter_inorder()))
 
         insights = f"""Tree Statistics:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 📊 Basic Information:
    • Total Nodes: {total_nodes}
+   • Keys (with copies): {len(self.bst)}
    • Leaf Nodes: {total_leaves}
    • Internal Nodes: {total_nodes - total_leaves}
    • Tree Height: {height}
@@ -1168,11 +3716,11 @@ def _inorder_traversal_rec(self, node):
 📈 Value Range:
    • Minimum Value: {min_val}
    • Maximum Value: {max_val}
-   • Value Range: {max_val - min_val if min_val and max_val else 0}
+   • Value Range: {max_val - min_val if isinstance(min_val, (int, float)) else "-"}
 
 🔄 Traversal:
-   • In-order: {traversal_result}
-   • Is Sorted: {traversal_result == sorted(traversal_result)}
+   • In-order: [{traversal_result}]
+   • Is Sorted: {is_sorted}
 
 ⚖️ Balance Analysis:
    • Perfect Binary Tree: {total_nodes == (2 ** height - 1)}
@@ -1189,7 +3737,8 @@ def _inorder_traversal_rec(self, node):
 
     def check_balance_and_warn(self):
         """Check if tree is unbalanced and show warning."""
-        if not self.bst or not self.bst.root:
+        if not self.bst or not self.bst.root or self.bst.balance != "none":
+            # Self-balancing trees keep their height logarithmic on their own
             self.balance_warning_group.setVisible(False)
             return
 
@@ -1197,21 +3746,21 @@ def _inorder_traversal_rec(self, node):
             if not node:
                 return 0
 
-            left_height = self.bst._get_height_rec(node.left)
-            right_height = self.bst._get_height_rec(node.right)
+            left_height = self.bst._node_height(node.left)
+            right_height = self.bst._node_height(node.right)
 
             return abs(left_height - right_height)
 
         def is_unbalanced(node):
-            if not node:
-                return False
-
-            if calculate_balance_factor(node) > 1:
-                return True
-
-            return is_unbalanced(node.left) or is_unbalanced(node.right)
+            stack = [node] if node else []
+            while stack:
+                node = stack.pop()
+                if calculate_balance_factor(node) > 1:
+                    return True
+                stack.extend(child for child in (node.left, node.right) if child)
+            return False
 
-        total_nodes = self.bst.root.count_subtree_nodes() if self.bst.root else 0
+        total_nodes = self.bst.node_count()
         height = self.bst.get_height()
         optimal_height = max(1, int(math.log2(total_nodes)) + 1) if total_nodes > 0 else 0
 
@@ -1220,65 +3769,80 @@ def _inorder_traversal_rec(self, node):
             self.balance_warning_label.setText(
                 f"⚠️ Tree is unbalanced!\n"
                 f"Current height: {height}, Optimal: ~{optimal_height}\n"
-                f"Consider rebalancing for better performance."
+                f"Consider AVL or Red-Black balancing for better performance."
             )
         else:
             self.balance_warning_group.setVisible(False)
 
     def export_node_data(self):
-        """Export tree data for analysis."""
+        """Export one row per node to a file on a background thread, showing progress and a preview."""
         if not self.bst or not self.bst.root:
             QMessageBox.information(self, "Export", "Tree is empty - nothing to export.")
             return
 
-        def collect_node_data(node, depth=0, path="root"):
-            if not node:
-                return []
-
-            data = []
-            node_info = {
-                'value': node.key,
-                'depth': depth,
-                'path': path,
-                'is_leaf': not node.left and not node.right,
-                'has_left_child': node.left is not None,
-                'has_right_child': node.right is not None,
-                'subtree_size': node.count_subtree_nodes()
-            }
-            data.append(node_info)
-
-            if node.left:
-                data.extend(collect_node_data(node.left, depth + 1, f"{path}.left"))
-            if node.right:
-                data.extend(collect_node_data(node.right, depth + 1, f"{path}.right"))
-
-            return data
+        path, chosen_filter = QFileDialog.getSaveFileName(self, "Export Tree Data", "tree_nodes.csv",
+                                                          ";;".join(EXPORT_FORMATS.values()))
+        if not path:
+            return
+        fmt = next((name for name, label in EXPORT_FORMATS.items() if label == chosen_filter), "csv")
 
-        node_data = collect_node_data(self.bst.root)
+        # The worker thread only touches this dict; the timer below reads it
+        state = {'rows': 0, 'result': None, 'error': None, 'done': False}
+        stop = threading.Event()
+        tree = self.bst
 
-        export_text = "Value,Depth,Path,IsLeaf,HasLeft,HasRight,SubtreeSize\n"
-        for node in node_data:
-            export_text += f"{node['value']},{node['depth']},{node['path']},{node['is_leaf']},{node['has_left_child']},{node['has_right_child']},{node['subtree_size']}\n"
+        def run_export():
+            try:
+                state['result'] = tree.export_nodes(path, fmt, progress=lambda rows: state.update(rows=rows),
+                                                    stop=stop)
+            except (OSError, ValueError) as error:
+                state['error'] = error
+            state['done'] = True
 
         dialog = QDialog(self)
         dialog.setWindowTitle("Export Tree Data")
         dialog.setGeometry(200, 200, 600, 400)
-
         layout = QVBoxLayout(dialog)
 
-        label = QLabel("Tree data in CSV format (copy to clipboard or save to file):")
-        layout.addWidget(label)
-
-        text_edit = QTextEdit()
-        text_edit.setPlainText(export_text)
-        text_edit.selectAll()
-        layout.addWidget(text_edit)
-
-        close_button = QPushButton("Close")
-        close_button.clicked.connect(dialog.accept)
-        layout.addWidget(close_button)
+        status_label = QLabel(f"Writing {EXPORT_FORMATS[fmt]} to {path}...")
+        layout.addWidget(status_label)
+        progress_bar = QProgressBar()
+        progress_bar.setRange(0, self.bst.node_count())
+        layout.addWidget(progress_bar)
+
+        # Only the first rows are shown; the file holds the full export
+        layout.addWidget(QLabel("Preview (first 50 nodes, CSV):"))
+        preview = QTextEdit()
+        preview.setReadOnly(True)
+        lines = [",".join(EXPORT_CSV_HEADER)]
+        lines.extend(",".join(map(str, row)) for row in islice(self.bst.iter_node_records(), 50))
+        preview.setPlainText("\n".join(lines))
+        layout.addWidget(preview)
+
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(lambda: stop.set() if not state['done'] else dialog.accept())
+        layout.addWidget(cancel_button)
+
+        def poll():
+            progress_bar.setValue(min(state['rows'], progress_bar.maximum()))
+            if not state['done']:
+                return
+            timer.stop()
+            if state['error'] is not None:
+                status_label.setText(f"Export failed: {state['error']}")
+            elif state['result'] is None:
+                status_label.setText("Export cancelled - no file was written.")
+            else:
+                progress_bar.setValue(progress_bar.maximum())
+                status_label.setText(f"Exported {state['result']} nodes to {path}")
+            cancel_button.setText("Close")
 
-        dialog.exec()
+        timer = QTimer(dialog)
+        timer.timeout.connect(poll)
+        timer.start(100)
+        dialog.finished.connect(lambda _: stop.set())
+        threading.Thread(target=run_export, daemon=True).start()
+        dialog.show()
 
     def get_explanation_for_step(self, step):
         """Generate HTML explanation for a step."""
@@ -1358,9 +3922,16 @@ def _inorder_traversal_rec(self, node):
                 <p>The value <b>{step.get('value')}</b> was not found in the tree.</p>
                 """
         elif action == 'start_traversal':
+            order = step.get('order', 'inorder')
+            description = {
+                'inorder': 'Left → Root → Right',
+                'preorder': 'Root → Left → Right',
+                'postorder': 'Left → Right → Root',
+                'levelorder': 'top to bottom, left to right',
+            }[order]
             return f"""
             <h3>Traversal Start</h3>
-            <p>Beginning in-order traversal (Left → Root → Right).</p>
+            <p>Beginning {TRAVERSAL_ORDERS[order].lower()} traversal ({description}).</p>
             """
         elif action == 'traverse_left':
             node = step.get('node')
@@ -1379,11 +3950,24 @@ def _inorder_traversal_rec(self, node):
             <p>At node <b>{node.key}</b>. Moving to the right subtree.</p>
             <p><b>Traversal Path:</b> {step.get('path', '')}</p>
             """
+        elif action in ['visit_preorder', 'visit_postorder', 'visit_levelorder']:
+            node = step.get('node')
+            reason = {
+                'visit_preorder': 'A node is visited before either of its subtrees.',
+                'visit_postorder': 'A node is visited only after both of its subtrees are done.',
+                'visit_levelorder': 'Nodes are visited one level at a time, left to right.',
+            }[action]
+            return f"""
+            <h3>Visiting Node</h3>
+            <p>Visiting node <b>{node.key}</b> (highlighted in yellow).</p>
+            <p>{reason}</p>
+            <p><b>Path:</b> {step.get('path', '')}</p>
+            """
         elif action == 'finish_traversal':
             result = step.get('result', [])
             return f"""
             <h3>Traversal Complete</h3>
-            <p>The in-order traversal is complete.</p>
+            <p>The {TRAVERSAL_ORDERS[step.get('order', 'inorder')].lower()} traversal is complete.</p>
             <p><b>Traversal Result:</b> {result}</p>
             """
         elif action == 'finish_insert':
@@ -1391,6 +3975,125 @@ def _inorder_traversal_rec(self, node):
             <h3>Insert Complete</h3>
             <p>The insertion operation for value <b>{step.get('value')}</b> is complete.</p>
             """
+        elif action == 'increment':
+            return f"""
+            <h3>Counting a Duplicate</h3>
+            <p>The value <b>{step.get('value')}</b> is already in the tree. Duplicates are being counted,
+            so its node now stands for <b>{step.get('count')}</b> copies.</p>
+            <p>No new node is created, and rank and select count every copy.</p>
+            <p><b>Traversal Path:</b> {step.get('path', '')}</p>
+            """
+        elif action == 'decrement':
+            return f"""
+            <h3>Removing One Copy</h3>
+            <p>The node for <b>{step.get('value')}</b> held more than one copy, so only its count drops,
+            to <b>{step.get('count')}</b>. The tree's shape does not change.</p>
+            """
+        elif action == 'start_delete':
+            return f"""
+            <h3>Start Delete</h3>
+            <p>We are deleting the value <b>{step.get('value')}</b>. First we search for it like any other key.</p>
+            """
+        elif action == 'visit_successor':
+            node = step.get('node')
+            return f"""
+            <h3>Finding the Successor</h3>
+            <p>The node to delete has two children, so the next larger key will take its place.</p>
+            <p>At node <b>{node.key}</b>, which has a left child: the successor is further left.</p>
+            <p><b>Path:</b> {step.get('path', '')}</p>
+            """
+        elif action == 'successor_found':
+            node = step.get('node')
+            return f"""
+            <h3>Successor Found</h3>
+            <p><b>{node.key}</b> is the leftmost node of the right subtree - the smallest key larger than <b>{step.get('value')}</b>.</p>
+            <p>It has no left child, so it can be unhooked without another search.</p>
+            """
+        elif action == 'splice':
+            node = step.get('node')
+            return f"""
+            <h3>Splicing In the Successor</h3>
+            <p>Successor <b>{node.key}</b> was unhooked (its right child took its old spot) and moved into the place of <b>{step.get('value')}</b>, adopting both of its children.</p>
+            <p>Every key on the left is still smaller and every key on the right still larger.</p>
+            """
+        elif action == 'remove':
+            node = step.get('node')
+            if node is None:
+                return f"""
+                <h3>Removing a Leaf</h3>
+                <p><b>{step.get('value')}</b> had no children, so it is simply unlinked from its parent.</p>
+                """
+            return f"""
+            <h3>Removing a Node</h3>
+            <p><b>{step.get('value')}</b> had one child, so child <b>{node.key}</b> and its subtree move up into its place.</p>
+            """
+        elif action == 'finish_delete':
+            if step.get('deleted'):
+                return f"""
+                <h3>Delete Complete</h3>
+                <p>The value <b>{step.get('value')}</b> was removed from the tree.</p>
+                """
+            return f"""
+            <h3>Delete Complete</h3>
+            <p>The value <b>{step.get('value')}</b> was not found, so the tree is unchanged.</p>
+            """
+        elif action == 'start_range':
+            high = step.get('high')
+            return f"""
+            <h3>Range Query</h3>
+            <p>Finding every key from <b>{step.get('value')}</b>{f" to <b>{high}</b>" if high is not None else " upwards"}.</p>
+            <p>One walk down the tree finds where the range starts; from there an in-order walk visits only the keys inside it.</p>
+            """
+        elif action == 'visit_range':
+            node = step.get('node')
+            return f"""
+            <h3>Key In Range</h3>
+            <p><b>{node.key}</b> lies inside the range and is reported next, in sorted order.</p>
+            """
+        elif action == 'finish_range':
+            return f"""
+            <h3>Range Query Complete</h3>
+            <p>Found <b>{step.get('count')}</b> keys in the range.</p>
+            <p>The work done was one root-to-leaf walk plus one step per key reported.</p>
+            """
+        elif action == 'start_query':
+            return f"""
+            <h3>Finding the {step.get('query').title()}</h3>
+            <p>Walking down from the root looking for the {step.get('query')} of <b>{step.get('value')}</b>,
+            remembering the closest candidate seen so far.</p>
+            """
+        elif action == 'query_result':
+            node = step.get('node')
+            if node is None:
+                return f"""
+                <h3>No {step.get('query').title()}</h3>
+                <p><b>{step.get('value')}</b> has no {step.get('query')} in the tree.</p>
+                """
+            return f"""
+            <h3>{step.get('query').title()} Found</h3>
+            <p>The {step.get('query')} of <b>{step.get('value')}</b> is <b>{node.key}</b>.</p>
+            """
+        elif action in ['rotate_left', 'rotate_right']:
+            node = step.get('node')
+            pivot = step.get('pivot')
+            direction = 'left' if action == 'rotate_left' else 'right'
+            child_side = 'right' if action == 'rotate_left' else 'left'
+            return f"""
+            <h3>Rotating {direction.title()}</h3>
+            <p>Node <b>{node.key}</b> is out of balance, so its {child_side} child <b>{pivot.key}</b> moves up into its place.</p>
+            <p><b>{node.key}</b> becomes the {direction} child of <b>{pivot.key}</b>, and the in-order sequence of keys stays the same.</p>
+            """
+        elif action == 'recolor':
+            node = step.get('node')
+            color = 'red' if step.get('red') else 'black'
+            return f"""
+            <h3>Recoloring Node</h3>
+            <p>Node <b>{node.key}</b> is recolored <b>{color}</b> to restore the red-black rules:</p>
+            <ul>
+                <li>A red node never has a red child.</li>
+                <li>Every path down to a null node passes the same number of black nodes.</li>
+            </ul>
+            """
 
     @staticmethod
     def _format_visit_node_explanation(node, path):
@@ -1418,24 +4121,97 @@ def _inorder_traversal_rec(self, node):
         """
 
 
+# --- Reading Key Files for Import ---
+def _parse_key(token):
+    """Parse a key from a file as an int, or a float when it isn't an integer (NaN is refused)."""
+    try:
+        return int(token)
+    except ValueError:
+        return _float_key(token)
+
+
+def read_key_chunks(path, fmt="text", chunk_size=10_000):
+    """Yield (keys, bytes_read) for successive chunks of a key file, holding one chunk in memory at a time.
+
+    fmt is one of IMPORT_FORMATS: "text" holds keys separated by whitespace,
+    "csv" has a key in the first column of each row (a header row that
+    doesn't parse is skipped), and "binary" is raw little-endian int64
+    values. A token that is not a number raises ValueError.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unknown import format {fmt!r}; expected one of {tuple(IMPORT_FORMATS)}")
+    with open(path, "rb") as file:
+        if fmt == "binary":
+            while keys := np.fromfile(file, dtype="<i8", count=chunk_size).tolist():
+                yield keys, file.tell()
+            return
+        if fmt == "text":
+            yield from _read_text_key_chunks(file, chunk_size)
+            return
+        keys = []
+        for line_number, row in enumerate(csv.reader(line.decode("utf-8") for line in file), 1):
+            for token in row[:1]:
+                try:
+                    keys.append(_parse_key(token))
+                except ValueError:
+                    if line_number == 1:
+                        continue
+                    raise ValueError(f"Line {line_number}: {token!r} is not a number") from None
+            if len(keys) >= chunk_size:
+                yield keys, file.tell()
+                keys = []
+        if keys:
+            yield keys, file.tell()
+
+
+def _read_text_key_chunks(file, chunk_size):
+    """Yield (keys, bytes_read) from whitespace-separated keys, reading the file in fixed-size blocks.
+
+    A token cut off at the end of a block is carried over to the next one,
+    and a chunk is yielded as soon as it holds chunk_size keys, however long
+    the lines are.
+    """
+    keys = []
+    carry = b""
+    lines = 0  # Newlines before the current block
+    while True:
+        block = file.read(IMPORT_BLOCK_SIZE)
+        data = carry + block
+        tokens = data.split()
+        carry = tokens.pop() if block and tokens and not data[-1:].isspace() else b""
+        for token in tokens:
+            try:
+                keys.append(_parse_key(token))
+            except ValueError:
+                # The first whole-token match is this one: an earlier copy would have failed already
+                position = re.search(rb"(?<!\S)" + re.escape(token) + rb"(?!\S)", data).start()
+                line_number = lines + data.count(b"\n", 0, position) + 1
+                token = token.decode("utf-8", "replace")
+                raise ValueError(f"Line {line_number}: {token!r} is not a number") from None
+            if len(keys) >= chunk_size:
+                yield keys, file.tell()
+                keys = []
+        if not block:
+            break
+        lines += data.count(b"\n")
+    if keys:
+        yield keys, file.tell()
+
+
 # --- NetworkX BST Visualization Utilities ---
 def visualize_bst_with_networkx(tree: BinarySearchTree):
     """Uses NetworkX and Matplotlib to render the BST as a graph."""
 
-    def add_edges(graph, node):
-        if node.left:
-            graph.add_edge(node.key, node.left.key)
-            add_edges(graph, node.left)
-        if node.right:
-            graph.add_edge(node.key, node.right.key)
-            add_edges(graph, node.right)
-
     if tree.root is None:
         print("Empty Tree")
         return
 
     graph = nx.DiGraph()
-    add_edges(graph, tree.root)
+    for node in tree.iter_nodes("preorder"):
+        if node.left:
+            graph.add_edge(node.key, node.left.key)
+        if node.right:
+            graph.add_edge(node.key, node.right.key)
 
     positions = hierarchy_pos(graph, tree.root.key)
     plt.figure(figsize=(8, 6))
@@ -1445,19 +4221,18 @@ def visualize_bst_with_networkx(tree: BinarySearchTree):
 
 
 def hierarchy_pos(graph, root=None, width=1.0, vert_gap=0.2, _vert_loc=0, _xcenter=0.5):
-    """Recursively positions a tree graph in a hierarchical layout."""
+    """Positions a tree graph in a hierarchical layout, using a stack instead of recursion."""
     pos = {}
-
-    def _hierarchy_pos(g, node, left, right, level=0):
-        x = (left + right) / 2
-        pos[node] = (x, -level * vert_gap)
-        neighbors = list(g.neighbors(node))
+    stack = [(root, 0, width, 0)]
+    while stack:
+        node, left, right, level = stack.pop()
+        pos[node] = ((left + right) / 2, -level * vert_gap)
+        neighbors = list(graph.neighbors(node))
         if neighbors:
             width_per_child = (right - left) / len(neighbors)
-            for i, child in enumerate(neighbors):
-                _hierarchy_pos(g, child, left + i * width_per_child, left + (i + 1) * width_per_child, level + 1)
-
-    _hierarchy_pos(graph, root, 0, width)
+            # Pushed last child first, so children are placed in order
+            for i in reversed(range(len(neighbors))):
+                stack.append((neighbors[i], left + i * width_per_child, left + (i + 1) * width_per_child, level + 1))
     return pos
 
 
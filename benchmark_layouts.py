@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Lookup benchmark for the PyTree BinarySearchTree layouts
+Compares the pointer tree against the static Eytzinger and van Emde Boas layouts
+
+Usage:
+    python benchmark_layouts.py                      # 10^4 .. 10^7 keys
+    python benchmark_layouts.py --sizes 10000 100000 --probes 50000
+
+Note: the pointer tree at 10^7 keys needs several GB of memory.
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from GUI import BinarySearchTree, STATIC_LAYOUTS
+
+
+def time_lookups(lookup, probes):
+    """Return the average nanoseconds per call of lookup over the probe keys."""
+    start = time.perf_counter()
+    for key in probes:
+        lookup(key)
+    return (time.perf_counter() - start) / len(probes) * 1e9
+
+
+def run(size, probe_count):
+    """Benchmark every layout on a balanced tree holding 0, 2, 4, ... (half the probes miss)."""
+    tree = BinarySearchTree.from_sorted(range(0, 2 * size, 2))
+    probes = [random.randrange(2 * size) for _ in range(probe_count)]
+
+    results = {"pointer": time_lookups(tree.__contains__, probes)}
+    for layout in STATIC_LAYOUTS:
+        start = time.perf_counter()
+        frozen = tree.freeze(layout)
+        frozen.__contains__(0)  # Builds the scalar lookup lists
+        build = time.perf_counter() - start
+        results[layout] = time_lookups(frozen.__contains__, probes)
+        results[f"{layout} build (s)"] = build
+
+    probe_array = np.array(probes)
+    start = time.perf_counter()
+    frozen.contains_many(probe_array)
+    results["batch"] = (time.perf_counter() - start) / probe_count * 1e9
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BST lookup layouts")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--probes", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'keys':>12} {'pointer':>10} {'eytzinger':>10} {'veb':>10} {'batch':>10}   (ns per lookup)")
+    for size in args.sizes:
+        results = run(size, args.probes)
+        print(f"{size:>12,} {results['pointer']:>10.0f} {results['eytzinger']:>10.0f} "
+              f"{results['veb']:>10.0f} {results['batch']:>10.1f}   "
+              f"build {results['eytzinger build (s)']:.2f}s / {results['veb build (s)']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -207,10 +207,8 @@ def launch_pyqt6():
 
         # Create sample tree as shown in the original code
         print("🌳 Creating sample Binary Search Tree...")
-        bst = BinarySearchTree(50)
-        values = [30, 70, 20, 40, 60, 80, 10, 25, 35, 45, 55, 65, 75, 85]
-        for val in values:
-            bst.insert(val)
+        values = [50, 30, 70, 20, 40, 60, 80, 10, 25, 35, 45, 55, 65, 75, 85]
+        bst = BinarySearchTree.from_iterable(values)
 
         # Launch the application
         print("✨ Starting PyQt6 application...")
@@ -0,0 +1,224 @@
+"""
+Parallel Bulk Build and Statistics for PyTree Binary Search Trees
+Sorts, deduplicates and lays out huge key sets across a process pool
+
+This module never imports Qt: worker processes only load it and NumPy.
+GUI.py (and PySide6 with it) is imported lazily, in the parent process only.
+
+Usage:
+    from parallel_build import build_parallel, tree_stats
+    tree = build_parallel(np.random.randint(0, 10**9, size=10**7), balance="avl")
+    print(tree_stats(tree))
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# --- Workers (plain NumPy, run in the pool) ---
+
+def _bucket_chunk(chunk, splitters):
+    """Sort and dedup one chunk of keys, then cut it into one piece per splitter bucket."""
+    chunk = np.unique(chunk)
+    return np.split(chunk, np.searchsorted(chunk, splitters, side='left'))
+
+
+def _merge_bucket(pieces):
+    """Merge every chunk's piece of one bucket into its sorted, distinct keys."""
+    return np.unique(np.concatenate(pieces))
+
+
+def _middle_split_columns(n, start, stop, red_depth):
+    """Return the node columns for in-order positions start..stop of the middle-split tree over n keys.
+
+    This is the tree from_sorted() builds. Node i's subtree covers some range
+    [lo, hi) of positions with i at its middle, so every node's children,
+    height, size and depth follow from its position alone. They are found by
+    descending towards all positions of the block at once, one level per pass.
+    """
+    index = np.arange(start, stop, dtype=np.int64)
+    lo = np.zeros_like(index)
+    hi = np.full_like(index, n)
+    depth = np.zeros_like(index)
+    active = np.ones(len(index), dtype=bool)
+    level = 0
+    while active.any():
+        mid = (lo + hi) // 2
+        go_left = active & (index < mid)
+        go_right = active & (index > mid)
+        depth[active & (index == mid)] = level
+        hi[go_left] = mid[go_left]
+        lo[go_right] = mid[go_right] + 1
+        active = go_left | go_right
+        level += 1
+    size = hi - lo
+    left = np.where(lo < index, (lo + index) // 2, -1)
+    right = np.where(index + 1 < hi, (index + 1 + hi) // 2, -1)
+    height = np.frexp(size.astype(np.float64))[1]  # size.bit_length()
+    red = (depth == red_depth) & (depth > 0)
+    return (left.astype(np.intc), right.astype(np.intc), height.astype(np.intc),
+            size.astype(np.intc), depth.astype(np.intc), red.astype(np.uint8))
+
+
+# Node columns of the tree being analysed, set once per worker by _init_stats_worker
+_LEFT = _RIGHT = None
+
+
+def _init_stats_worker(left, right):
+    global _LEFT, _RIGHT
+    _LEFT, _RIGHT = left, right
+
+
+def _subtree_stats(roots):
+    """Return (nodes, leaves, height) for each subtree root index, one level per NumPy pass."""
+    results = []
+    for root in roots:
+        nodes = leaves = height = 0
+        level = np.array([root], dtype=np.intp)
+        while level.size:
+            left, right = _LEFT[level], _RIGHT[level]
+            nodes += level.size
+            leaves += int(np.count_nonzero((left < 0) & (right < 0)))
+            level = np.concatenate((left[left >= 0], right[right >= 0]))
+            height += 1
+        results.append((nodes, leaves, height))
+    return results
+
+
+# --- Parent side ---
+
+def _pool(workers, initializer=None, initargs=()):
+    """Return (process pool, worker count); the pool is None for one worker, which runs everything here."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return None, workers
+    return ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs), workers
+
+
+def build_parallel(keys, balance="none", workers=None):
+    """Build a height-optimal tree over keys with a process pool; duplicates are dropped.
+
+    Keys are cut into chunks that workers sort and dedup. Each chunk is
+    split at sampled splitters, so each worker then merges one key range.
+    Finally workers lay out the node columns for consecutive blocks of the
+    tree. The result is the tree from_iterable() would build (valid for any
+    balance policy), stored in an ArrayNodeStore. Integer and float keys
+    get typed key columns and the matching key=int / key=float fast path;
+    uint64 keys beyond the int64 range keep key=int in a plain list column.
+    NaN keys are refused, as key=float trees refuse them.
+    """
+    from GUI import ArrayNode, ArrayNodeStore, BinarySearchTree
+
+    keys = np.asarray(keys)
+    if keys.dtype.kind == 'f' and np.isnan(keys).any():
+        raise ValueError("NaN cannot be a key: it is neither smaller nor larger than any other key")
+    executor, workers = _pool(workers)
+    run = executor.map if executor is not None else map
+    try:
+        # Splitters from a sorted sample give buckets of similar size
+        sample = np.unique(keys[np.random.default_rng().integers(0, len(keys), size=min(len(keys), 256 * workers))]
+                           if len(keys) else keys)
+        splitters = sample[len(sample) * np.arange(1, workers) // workers] if len(sample) else sample
+        chunks = np.array_split(keys, workers)
+        bucketed = list(run(_bucket_chunk, chunks, [splitters] * len(chunks)))
+        partitions = list(run(_merge_bucket, [[pieces[b] for pieces in bucketed] for b in range(len(splitters) + 1)]))
+
+        n = sum(len(part) for part in partitions)
+        red_depth = n.bit_length() - 1 if balance == "red_black" else -1
+        bounds = np.linspace(0, n, workers + 1, dtype=np.int64)
+        blocks = list(run(_middle_split_columns, [n] * workers, bounds[:-1].tolist(), bounds[1:].tolist(),
+                          [red_depth] * workers))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    sorted_keys = np.concatenate(partitions) if partitions else keys[:0]
+    key_func = {'i': int, 'u': int, 'f': float}.get(sorted_keys.dtype.kind)
+    # An int64 column would wrap uint64 keys of 2**63 and up around to negative numbers
+    typed = key_func is not None and not (sorted_keys.dtype.kind == 'u' and n
+                                          and sorted_keys[-1] > np.iinfo(np.int64).max)
+    store = ArrayNodeStore(('q' if key_func is int else 'd') if typed else None)
+    if not typed:
+        store.keys = sorted_keys.tolist()
+    else:
+        store.keys.frombytes(sorted_keys.astype(np.int64 if key_func is int else np.float64).tobytes())
+    left, right, height, size, depth, red = (np.concatenate(column) for column in zip(*blocks))
+    for name, column in (("left", left), ("right", right), ("height", height), ("size", size),
+                         ("cached_depth", depth)):
+        getattr(store, name).frombytes(column.tobytes())
+    store.count.frombytes(np.ones(n, dtype=np.intc).tobytes())
+    store.red = bytearray(red.tobytes())
+
+    tree = BinarySearchTree(balance=balance, storage=store, key=key_func)
+    tree.root = ArrayNode(store, n // 2) if n else None
+    return tree
+
+
+def tree_stats(tree, workers=None):
+    """Return node count, leaf count, height and min/max key of a tree, like the Insights panel.
+
+    For array-backed trees the subtrees below the top few levels are
+    measured in parallel and the per-subtree results are merged here. Each
+    worker gets its own copy of the child columns once, when the pool
+    starts (they are pickled into the initializer), not one per task.
+    Object trees are measured in this process.
+    """
+    if tree.root is None:
+        return {"nodes": 0, "leaves": 0, "height": 0, "min": None, "max": None}
+    if tree.store is None:
+        nodes = leaves = 0
+        for node in tree.iter_nodes("preorder"):
+            nodes += 1
+            leaves += node.left is None and node.right is None
+        results = [(nodes, leaves, tree.get_height())]
+        spine_nodes = spine_leaves = spine_height = 0
+        frontier = [0]
+    else:
+        store = tree.store
+        left = np.frombuffer(store.left, dtype=np.intc)
+        right = np.frombuffer(store.right, dtype=np.intc)
+        executor, workers = _pool(workers, _init_stats_worker, (left, right))
+        # Expand the top of the tree until there are a few subtrees per worker
+        spine_nodes = spine_leaves = spine_height = 0
+        level = [(tree.root._index, 0)]
+        while level and len(level) < 4 * workers and spine_height < 20:
+            next_level = []
+            for index, depth in level:
+                children = [child for child in (left[index], right[index]) if child >= 0]
+                spine_leaves += not children
+                next_level.extend((int(child), depth + 1) for child in children)
+            spine_nodes += len(level)
+            spine_height += 1
+            level = next_level
+        frontier = [depth for _, depth in level]
+        roots = [index for index, _ in level]
+        if executor is None:
+            # The views pin store.left/right against resizing: let go of them before returning
+            try:
+                _init_stats_worker(left, right)
+                results = _subtree_stats(roots)
+            finally:
+                _init_stats_worker(None, None)
+        else:
+            with executor:
+                groups = [roots[i::workers] for i in range(workers)]
+                results = [None] * len(roots)
+                for i, group in enumerate(executor.map(_subtree_stats, groups)):
+                    results[i::workers] = group
+
+    # Merge: the spine is known here, the subtrees hang below it at their depths,
+    # and the extremes are at the ends of the root's left and right spines
+    low, high = tree.root, tree.root
+    while low.left is not None:
+        low = low.left
+    while high.right is not None:
+        high = high.right
+    return {
+        "nodes": spine_nodes + sum(r[0] for r in results),
+        "leaves": spine_leaves + sum(r[1] for r in results),
+        "height": max([spine_height] + [depth + r[2] for depth, r in zip(frontier, results)]),
+        "min": low.key,
+        "max": high.key,
+    }
@@ -16,85 +16,187 @@ class TreeNode:
         self.key = key  # Store the value in this node
         self.left = None  # Initialize left child as empty (None)
         self.right = None  # Initialize right child as empty (None)
+        self.count = 1  # How many copies of the value this node holds (multiset mode)
 
 
 class BinarySearchTree:
     """Main class that manages the entire binary search tree"""
 
-    def __init__(self, root=None):
+    def __init__(self, root=None, multiset=False):
         # Constructor for the BST - can optionally start with a root value
         # 'root=None' means if no value is provided, default to None
+        # 'multiset=True' keeps repeated values by counting them on their node
+        self.multiset = multiset
         if root is not None:  # Check if a starting value was provided
             self.root = TreeNode(root)  # Create the first node with that value
         else:
             self.root = None  # Otherwise, start with an empty tree
 
+    @classmethod
+    def from_sorted(cls, iterable, multiset=False):
+        """Build a balanced tree from values that are already in ascending order."""
+        # A classmethod builds and returns a brand new tree: BinarySearchTree.from_sorted([...])
+        keys = []
+        counts = []  # How many times each value appeared
+        for key in iterable:
+            if keys and not key > keys[-1]:  # Must be ascending
+                if key == keys[-1]:
+                    counts[-1] += 1  # Only kept in multiset mode, just like insert()
+                    continue
+                raise ValueError("from_sorted() needs values in ascending order")
+            keys.append(key)
+            counts.append(1)
+
+        tree = cls(multiset=multiset)
+        if not keys:
+            return tree
+
+        # The middle value becomes the root, the middle of the left half becomes
+        # its left child, and so on. Each value is placed exactly once (O(n)),
+        # and the result is as short as a tree with these values can be.
+        mid = len(keys) // 2
+        tree.root = TreeNode(keys[mid])
+        stack = [(tree.root, 0, mid, len(keys))]  # (node, start, node's index, end)
+        while stack:
+            node, lo, mid, hi = stack.pop()
+            if multiset:
+                node.count = counts[mid]
+            if lo < mid:  # Values left of the middle form the left subtree
+                child_mid = (lo + mid) // 2
+                node.left = TreeNode(keys[child_mid])
+                stack.append((node.left, lo, child_mid, mid))
+            if mid + 1 < hi:  # Values right of the middle form the right subtree
+                child_mid = (mid + 1 + hi) // 2
+                node.right = TreeNode(keys[child_mid])
+                stack.append((node.right, mid + 1, child_mid, hi))
+        return tree
+
+    @classmethod
+    def from_iterable(cls, iterable, multiset=False):
+        """Build a balanced tree from values in any order."""
+        return cls.from_sorted(sorted(iterable), multiset=multiset)  # Sort once, then build
+
     def insert(self, key):
         """Insert a new key into the binary search tree."""
         # Public method that users call to add new values
         if self.root is None:  # Check if tree is completely empty
             self.root = TreeNode(key)  # If empty, make this the root node
-        else:
-            # Tree has nodes, so use helper method to find correct position
-            self._insert_rec(self.root, key)
-
-    def _insert_rec(self, node, key):
-        """Helper method to insert a new key recursively."""
-        # Private method (underscore prefix) - only used internally
-        # 'node' is current node we're examining, 'key' is value to insert
+            return
+
+        # Tree has nodes, so walk down with a loop to find the correct position.
+        # A loop (instead of recursion) means very tall trees can't overflow
+        # Python's call stack.
+        node = self.root  # 'node' is the current node we're examining
+        while True:
+            if key < node.key:  # New value is smaller than current node
+                if node.left is None:  # No left child exists
+                    node.left = TreeNode(key)  # Create new node as left child
+                    return
+                node = node.left  # Left child exists, so move down left side
 
-        if key < node.key:  # New value is smaller than current node
-            if node.left is None:  # No left child exists
-                node.left = TreeNode(key)  # Create new node as left child
-            else:
-                # Left child exists, so recurse down left side
-                self._insert_rec(node.left, key)
+            elif key > node.key:  # New value is larger than current node
+                if node.right is None:  # No right child exists
+                    node.right = TreeNode(key)  # Create new node as right child
+                    return
+                node = node.right  # Right child exists, so move down right side
 
-        elif key > node.key:  # New value is larger than current node
-            if node.right is None:  # No right child exists
-                node.right = TreeNode(key)  # Create new node as right child
             else:
-                # Right child exists, so recurse down right side
-                self._insert_rec(node.right, key)
-        # If key == node.key, we don't insert duplicates (implicit else case)
+                # If key == node.key, we don't insert duplicates -
+                # a multiset just counts one more copy on the same node
+                if self.multiset:
+                    node.count += 1
+                return
 
     def inorder_traversal(self):
-        """Public method to start in-order traversal"""
-        return self._inorder_traversal_rec(self.root)
-
-    def _inorder_traversal_rec(self, node):
-        """Private recursive helper for in-order traversal"""
-        if node is None:
-            return []
-
-        result = []
-        result.extend(self._inorder_traversal_rec(node.left))
-        result.append(node.key)
-        result.extend(self._inorder_traversal_rec(node.right))
-        return result
+        """Public method for in-order traversal (Left -> Root -> Right)"""
+        return list(self.iter_inorder())  # Collect every value from the generator
+
+    def iter_inorder(self):
+        """Generator that yields values in sorted order, one at a time"""
+        # 'yield' hands back one value and pauses here until the next one is
+        # requested, so the full list never has to exist in memory
+        stack = []  # Nodes whose left side we are still exploring
+        node = self.root
+        while stack or node is not None:
+            while node is not None:  # Go as far left as possible
+                stack.append(node)
+                node = node.left
+            node = stack.pop()  # Leftmost unvisited node
+            for _ in range(node.count):  # Visit it (once per copy in a multiset)
+                yield node.key
+            node = node.right  # Then explore its right subtree
 
     def search(self, key):
         """Search for a key in the tree"""
         # Public method - returns True if key exists, False otherwise
-        return self._search_rec(self.root, key)  # Start search from root
-
-    def _search_rec(self, node, key):
-        """Helper method to search recursively"""
-        # Private recursive method to actually perform the search
-
-        if node is None:  # Reached empty spot - key not found
+        node = self.root  # Start search from root
+        while node is not None:  # Stop when we reach an empty spot - key not found
+            if key == node.key:  # Found exact match
+                return True
+            elif key < node.key:  # Target is smaller than current node
+                node = node.left  # Search left subtree (where smaller values are stored)
+            else:  # key > node.key - target is larger
+                node = node.right  # Search right subtree (where larger values are stored)
+        return False
+
+    def count(self, key):
+        """Return how many copies of key the tree holds"""
+        node = self.root  # Same walk as search()
+        while node is not None:
+            if key == node.key:
+                return node.count
+            node = node.left if key < node.key else node.right
+        return 0  # Not in the tree at all
+
+    def remove_one(self, key):
+        """Remove a single copy of key. Returns True if a copy was removed."""
+        node = self.root
+        while node is not None and key != node.key:
+            node = node.left if key < node.key else node.right
+        if node is None:  # Key is not in the tree
             return False
-
-        if key == node.key:  # Found exact match
+        if node.count > 1:  # Other copies remain, so the node stays
+            node.count -= 1
             return True
+        return self.delete(key)  # Last copy: remove the node itself
+
+    def delete(self, key):
+        """Delete a key (every copy of it) from the tree. Returns True if the key was removed."""
+        # First find the node (and remember its parent so we can relink it)
+        parent = None
+        node = self.root
+        while node is not None and key != node.key:
+            parent = node
+            node = node.left if key < node.key else node.right
+
+        if node is None:  # Key is not in the tree
+            return False
 
-        elif key < node.key:  # Target is smaller than current node
-            # Search left subtree (where smaller values are stored)
-            return self._search_rec(node.left, key)
-        else:  # key > node.key - target is larger
-            # Search right subtree (where larger values are stored)
-            return self._search_rec(node.right, key)
+        if node.left is not None and node.right is not None:
+            # Two children: the in-order successor (smallest value on the right
+            # side) takes this node's place. It never has a left child, so it
+            # can be unhooked and moved up in this same walk - no second search
+            successor_parent = node
+            successor = node.right
+            while successor.left is not None:
+                successor_parent = successor
+                successor = successor.left
+            if successor_parent is not node:
+                successor_parent.left = successor.right  # Unhook the successor
+                successor.right = node.right  # It adopts the node's right subtree
+            successor.left = node.left  # ...and its left subtree
+            child = successor
+        else:
+            # 'node' has at most one child - that child takes its place
+            child = node.left if node.left is not None else node.right
 
+        if parent is None:
+            self.root = child
+        elif parent.left is node:
+            parent.left = child
+        else:
+            parent.right = child
+        return True
 
 
 # --- TreeCanvas Widget for graphical rendering of the BST ---
@@ -120,57 +222,30 @@ class TreeCanvas(QWidget):
         if self.bst.root is not None:
             # Compute layout
             positions = {}
-            # First, compute subtree sizes for layout
-            def compute_subtree_size(node):
-                if node is None:
-                    return 0
-                left = compute_subtree_size(node.left)
-                right = compute_subtree_size(node.right)
-                return left + right + 1
-            # Recursive function to assign positions
-            def layout(node, depth, x_min, x_max):
-                if node is None:
-                    return
-                # Compute horizontal position: center of allotted space
+            # Assign positions top-down with an explicit stack (no recursion,
+            # so tall trees can be drawn too): each node is centered in the
+            # horizontal space it was given and splits it between its children
+            width = self.width()
+            stack = [(self.bst.root, 0, self.node_radius, width - self.node_radius)]
+            while stack:
+                node, depth, x_min, x_max = stack.pop()
                 x = (x_min + x_max) // 2
                 y = self.level_height * depth + self.node_radius + 10
                 positions[node] = (x, y)
-                # Count left/right nodes for better spacing
-                left_count = compute_subtree_size(node.left)
-                right_count = compute_subtree_size(node.right)
-                total = left_count + right_count
-                # Split available horizontal space proportional to subtree sizes
-                if node.left:
-                    left_x_max = x - self.horiz_spacing // 2
-                    left_x_min = x_min
-                    if left_count > 0 and total > 0:
-                        left_x_max = x - self.horiz_spacing // 2
-                    layout(node.left, depth + 1, x_min, x - self.horiz_spacing)
                 if node.right:
-                    right_x_min = x + self.horiz_spacing // 2
-                    right_x_max = x_max
-                    if right_count > 0 and total > 0:
-                        right_x_min = x + self.horiz_spacing // 2
-                    layout(node.right, depth + 1, x + self.horiz_spacing, x_max)
-            # Use widget width for layout
-            width = self.width()
-            layout(self.bst.root, 0, self.node_radius, width - self.node_radius)
+                    stack.append((node.right, depth + 1, x + self.horiz_spacing, x_max))
+                if node.left:
+                    stack.append((node.left, depth + 1, x_min, x - self.horiz_spacing))
             # Draw edges first
             pen = QPen(QColor(80, 80, 80), 2)
             painter.setPen(pen)
-            def draw_edges(node):
-                if node is None:
-                    return
-                x1, y1 = positions[node]
+            for node, (x1, y1) in positions.items():
                 if node.left:
                     x2, y2 = positions[node.left]
                     painter.drawLine(x1, y1, x2, y2)
-                    draw_edges(node.left)
                 if node.right:
                     x2, y2 = positions[node.right]
                     painter.drawLine(x1, y1, x2, y2)
-                    draw_edges(node.right)
-            draw_edges(self.bst.root)
             # Draw nodes
             for node, (x, y) in positions.items():
                 if node.key in self.highlight_path:
@@ -266,27 +341,49 @@ class TreeVisualizer(QWidget):
 
     def refresh_display(self):
         """Update both the list and graphical tree."""
-        values = self.bst.inorder_traversal()
         self.list_widget.clear()
-        for val in values:
+        for val in self.bst.iter_inorder():
             self.list_widget.addItem(str(val))
         self.tree_canvas.refresh()
         self.tree_canvas.highlight_path = []
 
+    def _read_value(self, line_edit):
+        """Turn the typed text into a key: a number if it looks like one, otherwise the text itself"""
+        # Returns None (after showing a warning) when there is nothing usable
+        text = line_edit.text().strip()
+        if not text:
+            QMessageBox.warning(self, "Invalid Input", "Please enter a value.")
+            return None
+        for convert in (int, float):  # Any size of integer, then decimals like 2.5
+            try:
+                value = convert(text)
+                break
+            except ValueError:
+                continue
+        else:
+            value = text  # Not a number: keep it as text (sorted alphabetically)
+        if value != value:  # NaN is neither smaller nor larger than anything, so it has no place in the tree
+            QMessageBox.warning(self, "Invalid Input", "NaN cannot be placed in the tree. Please enter a number.")
+            return None
+        if self.bst.root is not None:
+            try:
+                value < self.bst.root.key  # Every key must be comparable with the others
+            except TypeError:
+                kind = type(self.bst.root.key).__name__
+                QMessageBox.warning(self, "Invalid Input", f"This tree holds {kind} values. Please enter one of those.")
+                return None
+        return value
+
     def insert_value(self):
-        value_text = self.insert_input.text()
-        if value_text.isdigit():
-            value = int(value_text)
+        value = self._read_value(self.insert_input)
+        if value is not None:
             self.bst.insert(value)
             self.insert_input.clear()
             self.refresh_display()
-        else:
-            QMessageBox.warning(self, "Invalid Input", "Please enter a valid integer.")
 
     def search_value(self):
-        value_text = self.search_input.text()
-        if value_text.isdigit():
-            value = int(value_text)
+        value = self._read_value(self.search_input)
+        if value is not None:
             path = []
             found = self._search_with_path(self.bst.root, value, path)
             self.tree_canvas.highlight_search_path(path, success=found)
@@ -301,52 +398,22 @@ class TreeVisualizer(QWidget):
             QMessageBox.information(self, "Search Explanation", explanation)
             self.search_input.clear()
             self.refresh_display()
-        else:
-            QMessageBox.warning(self, "Invalid Input", "Please enter a valid integer.")
 
     def _search_with_path(self, node, key, path):
-        if node is None:
-            return False
-        path.append(node.key)
-        if key == node.key:
-            return True
-        elif key < node.key:
-            return self._search_with_path(node.left, key, path)
-        else:
-            return self._search_with_path(node.right, key, path)
+        while node is not None:
+            path.append(node.key)
+            if key == node.key:
+                return True
+            node = node.left if key < node.key else node.right
+        return False
 
     def delete_value(self):
-        value_text = self.delete_input.text()
-        if value_text.isdigit():
-            value = int(value_text)
-            self.bst.root = self._delete_recursive(self.bst.root, value)
+        value = self._read_value(self.delete_input)
+        if value is not None:
+            if not self.bst.delete(value):
+                QMessageBox.information(self, "Delete Result", f"Value {value} was NOT found in the tree.")
             self.delete_input.clear()
             self.refresh_display()
-        else:
-            QMessageBox.warning(self, "Invalid Input", "Please enter a valid integer.")
-
-    def _delete_recursive(self, node, key):
-        if node is None:
-            return None
-        if key < node.key:
-            node.left = self._delete_recursive(node.left, key)
-        elif key > node.key:
-            node.right = self._delete_recursive(node.right, key)
-        else:
-            if node.left is None:
-                return node.right
-            elif node.right is None:
-                return node.left
-            temp = self._find_min(node.right)
-            node.key = temp.key
-            node.right = self._delete_recursive(node.right, temp.key)
-        return node
-
-    def _find_min(self, node):
-        current = node
-        while current.left is not None:
-            current = current.left
-        return current
 
     def clear_tree(self):
         self.bst.root = None